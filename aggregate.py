@@ -0,0 +1,94 @@
+"""
+Aggregates the parses of a single sentence in memory, chaining the parsers, the character indexing and clustering of
+resources.py, the aggregation of medcpt.py and the tree building of print_trees.py without any of the files the batch
+pipeline passes between them. The parser weights are learned beforehand by running the pipeline on a corpus and are
+loaded with load_weights(), so that a sentence only costs its parse plus a few milliseconds.
+
+    from aggregate import aggregate, load_weights
+    unweighted_tree, weighted_tree = aggregate('So did I.', load_weights('coraal'))
+"""
+
+import os
+import create_trees
+from artifacts import load_pickle
+from medcpt import medcpt
+from print_trees import create_trees as build_trees
+from resources import index_parsed_sentence
+
+# the input parsers in the order medcpt.py weights them
+FOLDERS = ['berkeley', 'corenlp', 'allennlp']
+
+
+def load_weights(input_directory: str) -> list:
+    """
+    Loads the parser weights that medcpt.py learned on a corpus, as used in its last iteration.
+
+    :param input_directory: name of the corpus
+    :return: weight of each parser in the order of FOLDERS
+    """
+    medcpt_aggregate_clusters_dictionary = load_pickle(os.path.join(
+        'dictionary_pickle_files', input_directory, 'medcpt', 'medcpt_aggregate_clusters_dictionary_log.pickle'))
+    final_iteration = medcpt_aggregate_clusters_dictionary[medcpt_aggregate_clusters_dictionary['iterations']]
+    return list(final_iteration['input_parser_weight'])
+
+
+def parse(sentence: str) -> dict:
+    """
+    Parses a sentence with all three parsers, tokenizing it once for all of them.
+
+    :param sentence: sentence to parse
+    :return: dictionary mapping parser name to tree in bracketed notation
+    """
+    tokens = create_trees.tokenize(sentence)
+    return {name: create_trees.PARSE_FUNCTIONS[name]([tokens])[0] for name in FOLDERS}
+
+
+def aggregate_trees(trees: dict, sentence: str, weights: list = None) -> tuple:
+    """
+    Aggregates the trees of a sentence that has already been parsed.
+
+    :param trees: dictionary mapping parser name to tree in bracketed notation
+    :param sentence: the sentence as a string
+    :param weights: weight of each parser in the order of FOLDERS; all parsers count the same by default
+    :return: tuple of trees in bracketed notation; the first one is with unweighted input parsers, and the second one
+    with weighted input parsers
+    """
+    if weights is None:
+        weights = [1] * len(FOLDERS)
+    medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
+    loop_dictionary = {}
+    for f, folder in enumerate(FOLDERS):
+        indexed = index_parsed_sentence(trees.get(folder, '').rstrip())
+        if indexed is None:
+            raise ValueError('The ' + folder + ' tree of the sentence could not be indexed')
+        cluster_span, cluster_pos = indexed[4], indexed[5]
+        unique_cluster_span, unique_pos_span = medcpt_object.get_unique_cluster_span(cluster_span=cluster_span,
+                                                                                     cluster_pos=cluster_pos)
+        loop_dictionary[f] = {'dictionary': {1: {'unique_cluster_span': unique_cluster_span,
+                                                 'unique_pos_span': unique_pos_span, 'error': False}}}
+
+    total_unique_cluster_span, total_unique_cluster_support, total_unique_cluster_pos = medcpt_object.get_support(
+        loop_dictionary=loop_dictionary, input_parser_count=len(FOLDERS), current_sentence_count=1)
+    medcpt_clusters, medcpt_pos = medcpt_object.aggregate_clusters(
+        input_parser_weight=weights, total_unique_cluster_span=total_unique_cluster_span,
+        total_unique_cluster_support=total_unique_cluster_support, total_unique_cluster_pos=total_unique_cluster_pos,
+        error=False)
+    iteration = {1: {'medcpt_clusters': medcpt_clusters,
+                     'mv_pos_aggregation': medcpt_object.aggregate_pos_labels(medcpt_pos=medcpt_pos,
+                                                                              input_parser_weight=[1] * len(FOLDERS)),
+                     'weight_pos_aggregation': medcpt_object.aggregate_pos_labels(medcpt_pos=medcpt_pos,
+                                                                                  input_parser_weight=weights)}}
+    return build_trees(1, iteration, sentence)
+
+
+def aggregate(sentence: str, weights: list = None) -> tuple:
+    """
+    Parses a sentence and aggregates its trees.
+
+    :param sentence: the sentence as a string
+    :param weights: weight of each parser in the order of FOLDERS, e.g. from load_weights(); all parsers count the
+    same by default
+    :return: tuple of trees in bracketed notation; the first one is with unweighted input parsers, and the second one
+    with weighted input parsers
+    """
+    return aggregate_trees(parse(sentence), sentence, weights)
@@ -0,0 +1,117 @@
+"""
+Writing and reading the pickled artifacts of the pipeline. Each artifact is written exactly once. With verification on,
+the SHA-256 checksum of an artifact is computed while it is written and recorded in checksums.json in its folder, the
+written file is hashed again to confirm it, and loading an artifact checks it against its recorded checksum instead of
+reloading and comparing whole dictionaries.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+MANIFEST_FILE = 'checksums.json'
+
+
+class HashingWriter:
+    def __init__(self, f):
+        """
+        Wraps a binary file so that everything written to it is also hashed.
+
+        :param f: file opened for binary writing
+        """
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        return self.f.write(data)
+
+
+def file_checksum(path: str) -> str:
+    """
+    Hashes a file without loading it into memory at once.
+
+    :param path: path to the file
+    :return: hexadecimal SHA-256 digest
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def read_manifest(directory: str) -> dict:
+    """
+    Reads the checksums recorded for the artifacts of a folder.
+
+    :param directory: folder of the artifacts
+    :return: dictionary mapping file name to hexadecimal SHA-256 digest
+    """
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def record_checksum(path: str, checksum: str = None) -> None:
+    """
+    Records the checksum of an artifact in the manifest of its folder, or removes it.
+
+    :param path: path to the artifact
+    :param checksum: hexadecimal SHA-256 digest, or None to remove the checksum of an artifact written unverified
+    :return: None
+    """
+    directory, name = os.path.split(path)
+    manifest = read_manifest(directory)
+    if checksum is None:
+        if name not in manifest:
+            return
+        del manifest[name]
+    else:
+        manifest[name] = checksum
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def save_pickle(obj, path: str, verify: bool = False) -> None:
+    """
+    Pickles an artifact to a file.
+
+    :param obj: object to save
+    :param path: path to the file
+    :param verify: whether to record the checksum of the file and confirm that it was written correctly
+    :return: None
+    """
+    if not verify:
+        with open(path, 'wb') as handle:
+            pickle.dump(obj, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        record_checksum(path)
+        return
+    with open(path, 'wb') as handle:
+        writer = HashingWriter(handle)
+        pickle.dump(obj, writer, protocol=pickle.HIGHEST_PROTOCOL)
+    checksum = writer.sha256.hexdigest()
+    if file_checksum(path) != checksum:
+        raise ValueError('Checksum mismatch after writing ' + path)
+    record_checksum(path, checksum)
+    print('Verified ' + path)
+
+
+def load_pickle(path: str, verify: bool = False):
+    """
+    Loads a pickled artifact.
+
+    :param path: path to the file
+    :param verify: whether to check the file against its recorded checksum, if it has one
+    :return: the unpickled object
+    """
+    if verify:
+        directory, name = os.path.split(path)
+        checksum = read_manifest(directory).get(name)
+        if checksum is not None and file_checksum(path) != checksum:
+            raise ValueError('Checksum mismatch in ' + path)
+    with open(path, 'rb') as handle:
+        return pickle.load(handle)
@@ -0,0 +1,57 @@
+"""
+A pool of CoreNLP servers behind the same annotate() call as a single CoreNLPClient, so that several requests to the
+Stanford parser can be in flight at once. Each request goes to the server with the fewest requests in flight, and a
+request waits when every server already has the maximum number in flight.
+"""
+
+import threading
+
+
+class CoreNLPPool:
+    def __init__(self, clients: list, max_in_flight: int):
+        """
+        Creates a pool.
+
+        :param clients: a CoreNLPClient for each server
+        :param max_in_flight: maximum number of requests sent to one server at the same time
+        """
+        self.clients = clients
+        self.max_in_flight = max_in_flight
+        self.in_flight = [0] * len(clients)
+        self._condition = threading.Condition()
+
+    def _acquire(self) -> int:
+        with self._condition:
+            while min(self.in_flight) >= self.max_in_flight:
+                self._condition.wait()
+            server = self.in_flight.index(min(self.in_flight))
+            self.in_flight[server] += 1
+            return server
+
+    def _release(self, server: int) -> None:
+        with self._condition:
+            self.in_flight[server] -= 1
+            self._condition.notify()
+
+    def annotate(self, text: str, **kwargs) -> dict:
+        """
+        Annotates text on the least busy server.
+
+        :param text: text to annotate
+        :param kwargs: further arguments of CoreNLPClient.annotate()
+        :return: the annotation
+        """
+        server = self._acquire()
+        try:
+            return self.clients[server].annotate(text, **kwargs)
+        finally:
+            self._release(server)
+
+    def stop(self) -> None:
+        """
+        Stops the servers started by the pool.
+
+        :return: None
+        """
+        for client in self.clients:
+            client.stop()
@@ -0,0 +1,100 @@
+"""
+Reading the input sentences. Every script takes the same --test_sentences argument, which can be the name of one of
+the sets in test_sentences/, the path to any file with lines of the format <entry name>:<sentence>, or - for stdin.
+The sentences are read lazily, so memory use does not grow with the size of the corpus.
+"""
+
+import hashlib
+import os
+import sys
+
+TEST_SENTENCES_DIRECTORY = 'test_sentences'
+
+
+def add_corpus_arguments(parser) -> None:
+    """
+    Adds the arguments selecting the input sentences to an argument parser.
+
+    :param parser: argparse.ArgumentParser of a script
+    :return: None
+    """
+    parser.add_argument('--test_sentences', type=str, default='basic_VPE',
+                        help='The set of test sentences to input: the name of a file in test_sentences/, '
+                             'the path to a file of <entry name>:<sentence> lines, or - for stdin')
+    parser.add_argument('--name', type=str, default=None,
+                        help='The name under which the output is stored; defaults to the file name of the input')
+
+
+def resolve_source(source: str) -> str:
+    """
+    Finds the file containing the input sentences.
+
+    :param source: name of a set of test sentences, path to a file, or - for stdin
+    :return: path to the file, or - for stdin
+    """
+    if source == '-':
+        return source
+    named_set = os.path.join(TEST_SENTENCES_DIRECTORY, source)
+    if os.path.isfile(named_set):
+        return named_set
+    if os.path.isfile(source):
+        return source
+    raise FileNotFoundError('No set of test sentences or file named ' + source)
+
+
+def corpus_name(source: str, name: str = None) -> str:
+    """
+    Determines the name under which the output for a corpus is stored.
+
+    :param source: name of a set of test sentences, path to a file, or - for stdin
+    :param name: explicitly given name, if any
+    :return: name of the corpus
+    """
+    if name is not None:
+        return name
+    if source == '-':
+        raise ValueError('--name is required when reading the sentences from stdin')
+    return os.path.splitext(os.path.basename(source))[0]
+
+
+def sentence_hash(text: str) -> str:
+    """
+    Hashes an input sentence, so that the later scripts can tell whether it has changed since it was parsed.
+
+    :param text: sentence
+    :return: the first 16 hexadecimal digits of its SHA-256 digest
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def read_sentence_lines(source: str):
+    """
+    Lazily reads the input sentences along with their line numbers in the source. Blank lines are skipped.
+
+    :param source: name of a set of test sentences, path to a file, or - for stdin
+    :return: generator of (sentence number starting at 1, line number starting at 1, entry name, sentence) tuples
+    """
+    path = resolve_source(source)
+    source_file = sys.stdin if path == '-' else open(path)
+    try:
+        number = 0
+        for line_number, line in enumerate(source_file, 1):
+            if line.strip() == '':
+                continue
+            number += 1
+            split = line.split(':', 1)
+            yield number, line_number, split[0], split[1].strip()
+    finally:
+        if source_file is not sys.stdin:
+            source_file.close()
+
+
+def read_sentences(source: str):
+    """
+    Lazily reads the input sentences. Blank lines are skipped.
+
+    :param source: name of a set of test sentences, path to a file, or - for stdin
+    :return: generator of (sentence number starting at 1, entry name, sentence) tuples
+    """
+    for number, line_number, entry, text in read_sentence_lines(source):
+        yield number, entry, text
@@ -1,95 +1,657 @@
-import benepar
-import spacy
-from stanza.server import CoreNLPClient
-from allennlp.predictors.predictor import Predictor
-import allennlp_models.tagging
 import re
 import os
+import glob
 import argparse
+import bisect
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from importlib import metadata
+from parse_cache import ParseCache
+from corpus import add_corpus_arguments, corpus_name, read_sentence_lines, sentence_hash
+from tree_store import TreeStore
+from corenlp_pool import CoreNLPPool
 
-parser = argparse.ArgumentParser(description='Parse the input sentences')
-parser.add_argument('--test_sentences', type=str, help='The set of test sentences to input',
-                    choices=['basic_VPE', 'callhome_non_VPE', 'callhome_VPE', 'coraal', 'non_VPE', 'VPE_examples'],
-                    default='basic_VPE')
-args = parser.parse_args()
+PARSERS = ['berkeley', 'corenlp', 'allennlp']
+CORENLP_DIR = os.environ.get('CORENLP_HOME', os.path.expanduser('~/stanza_corenlp'))
+BERKELEY_MODEL = 'benepar_en3'
+ALLEN_MODEL = "https://storage.googleapis.com/allennlp-public-models/elmo-constituency-parser-2020.02.10.tar.gz"
+DAEMON_URL = 'http://127.0.0.1:8765'
+# settings of the CoreNLP servers, filled in from the command line by configure_corenlp()
+CORENLP_OPTIONS = {'urls': [], 'servers': 1, 'port': 9000, 'max_in_flight': 1, 'memory': '8G', 'threads': 5,
+                   'timeout': 30000}
 
-if not os.path.exists(os.path.expanduser('~/stanza_corenlp')):
-    import stanza
-    stanza.install_corenlp()
+# the models are only loaded when a sentence actually needs them
+_models = {}
+_model_locks = {name: threading.Lock() for name in PARSERS + ['tokenizer', 'tagger']}
 
-ben = spacy.load('en_core_web_md')
-ben.add_pipe("benepar", config={"model": "benepar_en3"})
-corenlp = CoreNLPClient(annotators=['parse'], timeout=30000, memory='8G')
-allen = Predictor.from_path("https://storage.googleapis.com/allennlp-public-models/elmo-constituency-parser-2020.02.10.tar.gz")
+
+def load_tokenizer():
+    """
+    Loads the spaCy tokenizer shared by all parsers. A blank pipeline has the same tokenizer as en_core_web_md and loads
+    at once.
+
+    :return: spaCy pipeline that only tokenizes
+    """
+    import spacy
+    return spacy.blank('en')
+
+
+def load_tagger():
+    """
+    Loads the spaCy part-of-speech tagger, which provides the preterminals of the AllenNLP trees.
+
+    :return: spaCy pipeline
+    """
+    import spacy
+    return spacy.load('en_core_web_md', exclude=['parser', 'ner', 'lemmatizer'])
+
+
+def load_berkeley():
+    """
+    Loads spaCy with the benepar component.
+
+    :return: spaCy pipeline
+    """
+    import benepar
+    import spacy
+    ben = spacy.load('en_core_web_md')
+    ben.add_pipe("benepar", config={"model": BERKELEY_MODEL})
+    return ben
+
+
+def load_corenlp():
+    """
+    Creates a pool of CoreNLP clients. Given the URLs of running servers, the clients only attach to them. Otherwise
+    CoreNLP is installed if needed and each client, on consecutive local ports, attaches to a server already running
+    on its port or starts one on its first request.
+
+    :return: CoreNLP client pool
+    """
+    from stanza.server import CoreNLPClient, StartServer
+    clients = []
+    if len(CORENLP_OPTIONS['urls']) > 0:
+        for endpoint in CORENLP_OPTIONS['urls']:
+            clients.append(CoreNLPClient(annotators=['parse'], timeout=CORENLP_OPTIONS['timeout'], endpoint=endpoint,
+                                         start_server=StartServer.DONT_START))
+    else:
+        if not os.path.exists(CORENLP_DIR):
+            import stanza
+            stanza.install_corenlp()
+        for server in range(CORENLP_OPTIONS['servers']):
+            endpoint = 'http://localhost:' + str(CORENLP_OPTIONS['port'] + server)
+            clients.append(CoreNLPClient(annotators=['parse'], timeout=CORENLP_OPTIONS['timeout'], memory=CORENLP_OPTIONS['memory'],
+                                         threads=CORENLP_OPTIONS['threads'], endpoint=endpoint,
+                                         start_server=StartServer.TRY_START))
+    return CoreNLPPool(clients, CORENLP_OPTIONS['max_in_flight'])
+
+
+def add_corenlp_arguments(parser) -> None:
+    """
+    Adds the arguments configuring the CoreNLP servers to an argument parser.
+
+    :param parser: argparse.ArgumentParser of a script
+    :return: None
+    """
+    parser.add_argument('--corenlp_url', type=str, nargs='+', default=[],
+                        help='The addresses of running CoreNLP servers to attach to instead of starting any')
+    parser.add_argument('--corenlp_servers', type=int, default=1,
+                        help='The number of CoreNLP servers to start or attach to')
+    parser.add_argument('--corenlp_port', type=int, default=9000,
+                        help='The port of the first CoreNLP server; the others use the following ports')
+    parser.add_argument('--corenlp_max_in_flight', type=int, default=1,
+                        help='The maximum number of requests sent to one CoreNLP server at the same time')
+    parser.add_argument('--corenlp_memory', type=str, default='8G', help='The JVM memory of each CoreNLP server started')
+    parser.add_argument('--corenlp_threads', type=int, default=5, help='The threads of each CoreNLP server started')
+    parser.add_argument('--corenlp_timeout', type=int, default=30000,
+                        help='The time in milliseconds after which a CoreNLP request fails')
+
+
+def configure_corenlp(args) -> None:
+    """
+    Applies the CoreNLP arguments before the servers are started.
+
+    :param args: parsed arguments
+    :return: None
+    """
+    CORENLP_OPTIONS['urls'] = args.corenlp_url
+    CORENLP_OPTIONS['servers'] = args.corenlp_servers
+    CORENLP_OPTIONS['port'] = args.corenlp_port
+    CORENLP_OPTIONS['max_in_flight'] = args.corenlp_max_in_flight
+    CORENLP_OPTIONS['memory'] = args.corenlp_memory
+    CORENLP_OPTIONS['threads'] = args.corenlp_threads
+    CORENLP_OPTIONS['timeout'] = args.corenlp_timeout
+
+
+def load_allen():
+    """
+    Downloads and loads the AllenNLP constituency parser.
+
+    :return: AllenNLP predictor
+    """
+    from allennlp.predictors.predictor import Predictor
+    import allennlp_models.tagging
+    return Predictor.from_path(ALLEN_MODEL)
+
+
+def get_model(name: str):
+    """
+    Returns a parser model, loading it on first use.
+
+    :param name: name of the parser (berkeley, corenlp or allennlp) or of a shared spaCy model (tokenizer or tagger)
+    :return: the spaCy pipeline, CoreNLP client or AllenNLP predictor
+    """
+    loaders = {'berkeley': load_berkeley, 'corenlp': load_corenlp, 'allennlp': load_allen, 'tokenizer': load_tokenizer,
+               'tagger': load_tagger}
+    with _model_locks[name]:
+        if name not in _models:
+            _models[name] = loaders[name]()
+    return _models[name]
+
+
+def corenlp_version() -> str:
+    """
+    Identifies the installed CoreNLP release from the name of its jar.
+
+    :return: model identifier of the Stanford parser
+    """
+    for jar in glob.glob(os.path.join(CORENLP_DIR, 'stanford-corenlp-*.jar')):
+        match = re.fullmatch(r'stanford-corenlp-([\d.]+)\.jar', os.path.basename(jar))
+        if match:
+            return 'corenlp-' + match.group(1)
+    return 'corenlp-unknown'
+
+
+def tokenize(sentence: str) -> str:
+    """
+    Tokenizes a sentence once for all parsers, so that they parse the same tokens and their trees have the same leaves.
+    The whole line is kept as a single sentence.
+
+    :param sentence: sentence
+    :return: sentence with its tokens separated by single spaces
+    """
+    return ' '.join(token.text for token in get_model('tokenizer')(sentence) if not token.is_space)
+
+
+def tokenize_batch(batch: list) -> list:
+    """
+    Tokenizes a batch of sentences, so that the tokens can be cached like the trees of a parser.
+
+    :param batch: list of sentences
+    :return: list of sentences with their tokens separated by single spaces
+    """
+    return [tokenize(sentence) for sentence in batch]
+
+
+def tokenizer_version() -> str:
+    """
+    Identifies the installed spaCy release without importing it, so that checking the cache does not load spaCy.
+
+    :return: model identifier of the tokenizer
+    """
+    try:
+        return 'spacy-blank-en-' + metadata.version('spacy')
+    except metadata.PackageNotFoundError:
+        return 'spacy-blank-en-unknown'
+
+
+def make_docs(vocab, batch: list) -> list:
+    """
+    Builds spaCy documents from pre-tokenized sentences, each of which is a single sentence.
+
+    :param vocab: vocabulary of the spaCy pipeline
+    :param batch: sentences with their tokens separated by single spaces
+    :return: spaCy documents
+    """
+    from spacy.tokens import Doc
+    docs = []
+    for s in batch:
+        words = s.split(' ')
+        docs.append(Doc(vocab, words=words, sent_starts=[True] + [False] * (len(words) - 1)))
+    return docs
 
 
 def berkeley_parse(s: str) -> str:
     """
-    Parses a sentence using the Berkeley parser.
+    Parses a pre-tokenized sentence using the Berkeley parser.
 
-    :param s: sentence to parse
+    :param s: sentence to parse, with its tokens separated by single spaces
     :return: tree in bracketed notation
     """
-    doc = ben(s)
-    sent = list(doc.sents)[0]
-    return sent._.parse_string
+    return berkeley_parse_batch([s])[0]
 
 
 # adapted from Goldner (2021)
+def normalize_stanford_tree(tree: str) -> str:
+    """
+    Normalizes a tree produced by the Stanford parser.
+
+    :param tree: tree in bracketed notation as returned by CoreNLP
+    :return: tree on a single line without the ROOT node
+    """
+    tree = re.sub(r'\r\n', '', tree)
+    tree = re.sub(r' +', ' ', tree)
+    return tree[6:-1]  # remove ROOT
+
+
 def stanford_parse(s: str) -> str:
     """
-    Parses a sentence using the Stanford parser from CoreNLP.
+    Parses a pre-tokenized sentence using the Stanford parser from CoreNLP.
 
-    :param s: sentence to parse
+    :param s: sentence to parse, with its tokens separated by single spaces
     :return: tree in bracketed notation
     """
-    ann = corenlp.annotate(s, output_format='json')
-    sent = ann['sentences'][0]['parse']
-    # normalize output
-    sent = re.sub(r'\r\n', '', sent)
-    sent = re.sub(r' +', ' ', sent)
-    sent = sent[6:-1]  # remove ROOT
-    return sent
+    return stanford_parse_batch([s])[0]
 
 
 def allen_parse(s: str) -> str:
     """
-    Parses a sentence using the AllenNLP parser.
+    Parses a pre-tokenized sentence using the AllenNLP parser.
 
-    :param s: sentence to parse
+    :param s: sentence to parse, with its tokens separated by single spaces
     :return: tree in bracketed notation
     """
-    output = allen.predict(s)
-    return output['trees']
+    return allen_parse_batch([s])[0]
+
+
+def berkeley_parse_batch(batch: list) -> list:
+    """
+    Parses a batch of pre-tokenized sentences using the Berkeley parser. The dependency parser is skipped since it
+    would segment the sentences again.
+
+    :param batch: sentences to parse, with their tokens separated by single spaces
+    :return: trees in bracketed notation, one per sentence
+    """
+    ben = get_model('berkeley')
+    docs = ben.pipe(make_docs(ben.vocab, batch), batch_size=len(batch), disable=['parser', 'ner'])
+    return [list(doc.sents)[0]._.parse_string for doc in docs]
+
+
+def stanford_parse_batch(batch: list) -> list:
+    """
+    Parses a batch of pre-tokenized sentences with a single CoreNLP request. The sentences are sent one per line,
+    tokenized on whitespace and split only at line ends, and the parses are matched back to their lines by character
+    offset.
+
+    :param batch: sentences to parse, with their tokens separated by single spaces
+    :return: trees in bracketed notation, one per sentence
+    """
+    line_starts = []
+    offset = 0
+    for s in batch:
+        line_starts.append(offset)
+        offset += len(s) + 1
+    ann = get_model('corenlp').annotate('\n'.join(batch),
+                                        properties={'tokenize.whitespace': 'true', 'ssplit.eolonly': 'true'},
+                                        output_format='json')
+    trees = [''] * len(batch)
+    for sent in ann['sentences']:
+        line = bisect.bisect_right(line_starts, sent['tokens'][0]['characterOffsetBegin']) - 1
+        if trees[line] == '':
+            trees[line] = normalize_stanford_tree(sent['parse'])
+    return trees
+
+
+def allen_parse_batch(batch: list) -> list:
+    """
+    Parses a batch of pre-tokenized sentences using the AllenNLP parser, with part-of-speech tags from spaCy.
+
+    :param batch: sentences to parse, with their tokens separated by single spaces
+    :return: trees in bracketed notation, one per sentence
+    """
+    predictor = get_model('allennlp')
+    tagger = get_model('tagger')
+    instances = [predictor._dataset_reader.text_to_instance([token.text for token in doc], [token.tag_ for token in doc])
+                 for doc in tagger.pipe(make_docs(tagger.vocab, batch))]
+    outputs = predictor.predict_batch_instance(instances)
+    return [output['trees'] for output in outputs]
+
+
+# the batch parsing function of each parser in PARSERS, shared with aggregate.py and parser_daemon.py
+PARSE_FUNCTIONS = {'berkeley': berkeley_parse_batch, 'corenlp': stanford_parse_batch, 'allennlp': allen_parse_batch}
+
+
+def daemon_parsers(url: str) -> list:
+    """
+    Checks whether the parser daemon is running.
+
+    :param url: address of the daemon
+    :return: names of the parsers the daemon serves, or an empty list if it is not reachable
+    """
+    try:
+        with urllib.request.urlopen(url + '/health', timeout=1) as response:
+            return json.load(response)['parsers']
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def daemon_parse_batch(url: str, name: str):
+    """
+    Creates a batch parsing function that sends the sentences to the parser daemon.
+
+    :param url: address of the daemon
+    :param name: name of the parser
+    :return: function mapping a list of sentences to a list of trees in bracketed notation
+    """
+    def parse_batch(batch: list) -> list:
+        body = json.dumps({'sentences': batch, 'parsers': [name], 'pretokenized': True}).encode('utf-8')
+        request = urllib.request.Request(url + '/parse', data=body, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return json.load(response)['trees'][name]
+        except urllib.error.HTTPError as e:
+            raise RuntimeError('parser daemon: ' + json.load(e).get('error', str(e))) from e
+    return parse_batch
+
+
+def count_tokens(sentence: str) -> int:
+    """
+    Counts the tokens of a pre-tokenized sentence.
+
+    :param sentence: sentence with its tokens separated by single spaces
+    :return: number of tokens
+    """
+    return len(sentence.split())
+
+
+def make_batches(sentences, batch_size: int):
+    """
+    Groups a stream of sentences into batches, reading no further ahead than the current batch.
+
+    :param sentences: iterable of (sentence number, sentence) tuples
+    :param batch_size: number of sentences per batch
+    :return: generator of (sentence numbers, sentences) tuples
+    """
+    iterator = iter(sentences)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if len(batch) == 0:
+            return
+        yield [number for number, sentence in batch], [sentence for number, sentence in batch]
+
+
+def make_bucketed_batches(sentences, token_budget: int, window: int):
+    """
+    Groups a stream of sentences into batches of similar length. Each window of sentences is sorted by length and cut
+    into batches whose padded size, the number of sentences times the length of the longest one, stays within the
+    token budget. A sentence longer than the budget gets a batch of its own.
+
+    :param sentences: iterable of (sentence number, sentence) tuples
+    :param token_budget: maximum padded number of tokens per batch
+    :param window: number of sentences read ahead and sorted at once
+    :return: generator of (sentence numbers, sentences) tuples, out of sentence order within a window
+    """
+    iterator = iter(sentences)
+    while True:
+        bucket = list(itertools.islice(iterator, window))
+        if len(bucket) == 0:
+            return
+        bucket.sort(key=lambda item: count_tokens(item[1]))
+        numbers, batch, longest = [], [], 0
+        for number, sentence in bucket:
+            length = max(count_tokens(sentence), 1)
+            if len(batch) > 0 and max(longest, length) * (len(batch) + 1) > token_budget:
+                yield numbers, batch
+                numbers, batch, longest = [], [], 0
+            numbers.append(number)
+            batch.append(sentence)
+            longest = max(longest, length)
+        if len(batch) > 0:
+            yield numbers, batch
+
+
+def in_sentence_order(results, order):
+    """
+    Puts the trees of batches that were formed out of sentence order back in order.
+
+    :param results: iterable of (sentence numbers, trees of each parser) tuples
+    :param order: iterable of the sentence numbers in the order of the input
+    :return: generator of (sentence number, tree of each parser) tuples in the order of the input
+    """
+    order = iter(order)
+    pending = {}
+    expected = next(order, None)
+    for numbers, trees in results:
+        for offset, number in enumerate(numbers):
+            pending[number] = [parser_trees[offset] for parser_trees in trees]
+        while expected in pending:
+            yield expected, pending.pop(expected)
+            expected = next(order, None)
+    for number in sorted(pending):
+        yield number, pending[number]
+
+
+def isolate_failures(parse_batch):
+    """
+    Wraps a batch parsing function so that a sentence it fails on, e.g. by timing out, does not fail the others. When a
+    batch fails, its sentences are parsed again one at a time, and the exception of each sentence that still fails is
+    returned in place of its tree.
+
+    :param parse_batch: function mapping a list of sentences to a list of trees
+    :return: function mapping a list of sentences to a list of trees or exceptions
+    """
+    def isolated_parse_batch(batch: list) -> list:
+        try:
+            return parse_batch(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                return [e]
+        trees = []
+        for s in batch:
+            try:
+                trees.extend(parse_batch([s]))
+            except Exception as e:
+                trees.append(e)
+        return trees
+    return isolated_parse_batch
+
+
+class Throughput:
+    def __init__(self):
+        """
+        Keeps the number of sentences and tokens each parser has parsed and the time it spent on them.
+        """
+        self.sentences = {}
+        self.tokens = {}
+        self.seconds = {}
+        self._lock = threading.Lock()
+
+    def timed(self, parser_name: str, parse_batch):
+        """
+        Wraps a batch parsing function so that its calls are counted and timed.
+
+        :param parser_name: name of the parser
+        :param parse_batch: function mapping a list of sentences to a list of trees
+        :return: function mapping a list of sentences to a list of trees
+        """
+        def timed_parse_batch(batch: list) -> list:
+            begin = time.perf_counter()
+            trees = parse_batch(batch)
+            seconds = time.perf_counter() - begin
+            with self._lock:
+                self.sentences[parser_name] = self.sentences.get(parser_name, 0) + len(batch)
+                self.tokens[parser_name] = self.tokens.get(parser_name, 0) + sum(count_tokens(s) for s in batch)
+                self.seconds[parser_name] = self.seconds.get(parser_name, 0.0) + seconds
+            return trees
+        return timed_parse_batch
+
+    def report(self) -> str:
+        """
+        Summarizes the throughput of each parser over the time spent in its calls.
+
+        :return: one line per parser that parsed anything
+        """
+        lines = []
+        for parser_name in self.sentences:
+            seconds = max(self.seconds[parser_name], 1e-9)
+            lines.append('%s: %d sentences, %d tokens in %.1f s (%.1f sentences/s, %.1f tokens/s)' % (
+                parser_name, self.sentences[parser_name], self.tokens[parser_name], self.seconds[parser_name],
+                self.sentences[parser_name] / seconds, self.tokens[parser_name] / seconds))
+        return '\n'.join(lines)
+
+
+def parse_serially(batches: list, parse_functions: list):
+    """
+    Runs the parsers one after another on each batch.
+
+    :param batches: iterable of (sentence numbers, sentences) tuples
+    :param parse_functions: batch parsing function of each parser
+    :return: generator of (sentence numbers, trees of each parser) tuples
+    """
+    for numbers, batch in batches:
+        yield numbers, [parse_function(batch) for parse_function in parse_functions]
+
+
+def parse_concurrently(batches: list, parse_functions: list, workers: list, queue_size: int):
+    """
+    Runs each parser on its own pool of worker threads, so the CoreNLP round trips overlap with the local models.
+    Results are yielded in the order of the batches, and at most queue_size batches are in flight at once.
+
+    :param batches: iterable of (sentence numbers, sentences) tuples
+    :param parse_functions: batch parsing function of each parser
+    :param workers: number of worker threads of each parser
+    :param queue_size: maximum number of batches submitted but not yet yielded
+    :return: generator of (sentence numbers, trees of each parser) tuples
+    """
+    executors = [ThreadPoolExecutor(max_workers=n) for n in workers]
+    pending = deque()
+    try:
+        for numbers, batch in batches:
+            futures = [executor.submit(parse_function, batch)
+                       for executor, parse_function in zip(executors, parse_functions)]
+            pending.append((numbers, futures))
+            if len(pending) >= queue_size:
+                first, first_futures = pending.popleft()
+                yield first, [future.result() for future in first_futures]
+        while pending:
+            first, first_futures = pending.popleft()
+            yield first, [future.result() for future in first_futures]
+    finally:
+        for executor in executors:
+            executor.shutdown(cancel_futures=True)
 
 
 if __name__ == '__main__':
-    # retrieve sentences to parse
-    sentences = []
-    with open(os.path.join('test_sentences', args.test_sentences)) as source_file:
-        for line in source_file:
-            split = line.split(':')
-            text = split[1].strip()
-            sentences.append(text)
-
-    # set up directory structure
-    parent_dir = os.path.join('dataset', args.test_sentences)
-    child_dirs = ['berkeley', 'corenlp', 'allennlp']
-
-    for child in child_dirs:
-        child_path = os.path.join(parent_dir, child)
-        if not os.path.exists(child_path):
-            os.makedirs(child_path)
-
-    # parse sentences and store trees
-    output_files = [os.path.join(parent_dir, directory, 'sentence_') for directory in child_dirs]
-    for idx, sentence in enumerate(sentences):
-        berkeley_tree = berkeley_parse(sentence)
-        stanford_tree = stanford_parse(sentence)
-        allen_tree = allen_parse(sentence)
-        trees = [berkeley_tree, stanford_tree, allen_tree]
-
-        for tree_idx, tree in enumerate(trees):
-            file_name = output_files[tree_idx] + str(idx + 1) + '.txt'
-            with open(file_name, 'w') as f:
-                f.write(tree)
+    parser = argparse.ArgumentParser(description='Parse the input sentences')
+    add_corpus_arguments(parser)
+    parser.add_argument('--parsers', type=str, nargs='+', choices=PARSERS, default=PARSERS,
+                        help='The parsers to run')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='The number of sentences sent to each parser at once')
+    parser.add_argument('--token_budget', type=int, default=None,
+                        help='Batch sentences of similar length up to this many padded tokens instead of by --batch_size')
+    parser.add_argument('--bucket_window', type=int, default=1000,
+                        help='The number of sentences read ahead and sorted by length with --token_budget')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='Run the parsers at the same time on their own worker threads')
+    parser.add_argument('--berkeley_workers', type=int, default=1, help='Worker threads for the Berkeley parser')
+    parser.add_argument('--corenlp_workers', type=int, default=1, help='Worker threads for the Stanford parser')
+    parser.add_argument('--allennlp_workers', type=int, default=1, help='Worker threads for the AllenNLP parser')
+    parser.add_argument('--queue_size', type=int, default=4,
+                        help='The maximum number of batches in flight at once in concurrent mode')
+    add_corenlp_arguments(parser)
+    parser.add_argument('--cache', type=str, default='parse_cache.sqlite', help='Path to the persistent parse cache')
+    parser.add_argument('--cache_size', type=int, default=1024, help='The maximum size of the parse cache in MB')
+    parser.add_argument('--no_cache', action='store_true', help='Parse every sentence without using the cache')
+    parser.add_argument('--daemon', type=str, default=DAEMON_URL,
+                        help='The address of the parser daemon, which is used instead of loading the models if running')
+    parser.add_argument('--no_daemon', action='store_true', help='Always load the models in this process')
+    parser.add_argument('--resume', action='store_true',
+                        help='Only parse the sentences the parsers have not completed in an earlier run')
+    parser.add_argument('--retry_errors', action='store_true',
+                        help='With --resume, also parse the sentences the parsers failed on again')
+    args = parser.parse_args()
+    configure_corenlp(args)
+
+    # open the tree store of the corpus, whose records show which sentences each parser has completed
+    store = TreeStore(os.path.join('dataset', corpus_name(args.test_sentences, args.name)))
+    child_dirs = [name for name in PARSERS if name in args.parsers]
+
+    def completed(number: int, name: str, text: str) -> bool:
+        if not args.resume or name not in store.offsets.get(number, {}):
+            return False
+        # a sentence that has changed in the input since this parser parsed it is parsed again
+        if not store.matches_input(number, text, name):
+            return False
+        return not args.retry_errors or 'error' not in store.get_record(number, name)
+
+    # the line, entry name, hash and text of each sentence in flight, which go into the manifest along with its trees,
+    # and the parsers that had already completed it, whose trees are kept
+    sources = {}
+
+    def read_input():
+        for number, line, entry, text in read_sentence_lines(args.test_sentences):
+            info = {'line': line, 'entry': entry, 'hash': sentence_hash(text), 'text': text}
+            skipped = {name for name in child_dirs if completed(number, name, text)}
+            if len(skipped) < len(child_dirs):
+                sources[number] = info, skipped
+                yield number, text
+
+    # stream the sentences to parse, tokenized once for all parsers; the tokens are cached along with the trees, so a
+    # run served entirely from the cache does not load spaCy
+    cache = None
+    tokenize_function = tokenize_batch
+    if not args.no_cache:
+        cache = ParseCache(args.cache, args.cache_size * 1024 * 1024)
+        tokenize_function = cache.cached('tokenizer', tokenizer_version(), tokenize_batch)
+    sentences = ((number, tokenize_function([text])[0]) for number, text in read_input())
+    sentences, order = itertools.tee(sentences)
+
+    # parse sentences in batches and store trees
+    if args.token_budget is not None:
+        batches = make_bucketed_batches(sentences, args.token_budget, args.bucket_window)
+    else:
+        batches = make_batches(sentences, args.batch_size)
+    all_parse_functions = dict(PARSE_FUNCTIONS)
+    if not args.no_daemon:
+        served = daemon_parsers(args.daemon)
+        for name in served:
+            all_parse_functions[name] = daemon_parse_batch(args.daemon, name)
+        if len(served) > 0:
+            print('Using the parser daemon at ' + args.daemon + ' for ' + ', '.join(served))
+    throughput = Throughput()
+    parse_functions = [throughput.timed(name, all_parse_functions[name]) for name in child_dirs]
+    # failed batches are retried inside the cache, so each sentence is looked up and counted once
+    parse_functions = [isolate_failures(parse_function) for parse_function in parse_functions]
+    if cache is not None:
+        all_models = {'berkeley': BERKELEY_MODEL, 'corenlp': corenlp_version(), 'allennlp': ALLEN_MODEL}
+        parse_functions = [cache.cached(name, all_models[name], parse_function)
+                           for name, parse_function in zip(child_dirs, parse_functions)]
+    if args.concurrent:
+        all_workers = {'berkeley': args.berkeley_workers, 'corenlp': args.corenlp_workers,
+                       'allennlp': args.allennlp_workers}
+        workers = [all_workers[name] for name in child_dirs]
+        results = parse_concurrently(batches, parse_functions, workers, args.queue_size)
+    else:
+        results = parse_serially(batches, parse_functions)
+
+    errors = 0
+    for number, trees in in_sentence_order(results, (number for number, sentence in order)):
+        info, skipped = sources.pop(number)
+        for name, tree in zip(child_dirs, trees):
+            if name in skipped:
+                continue
+            if isinstance(tree, Exception):
+                store.append(number, name, '', error=repr(tree), **info)
+                errors += 1
+            else:
+                store.append(number, name, tree, **info)
+        # each sentence is on disk before the next one, so an interrupted run can be resumed from there
+        store.flush()
+    store.compact()
+    store.close()
+
+    if errors > 0:
+        print(str(errors) + ' trees failed and were stored as errors')
+
+    if len(throughput.sentences) > 0:
+        print(throughput.report())
+
+    if cache is not None:
+        print(cache.report())
+        cache.close()
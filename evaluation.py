@@ -2,6 +2,7 @@
 Code source: Kulkarni et al. (2022)
 My changes:
 - removed functions outside the class
+- looked up the (start, end) cluster intervals in sets
 """
 
 
@@ -20,8 +21,9 @@ class evaluation:
 
     def precision_score(self, true_cluster, predict_cluster):
         TP = 0
+        true_cluster_set = set(true_cluster)
         for i in range(0, len(predict_cluster)):
-            if predict_cluster[i] in true_cluster:
+            if predict_cluster[i] in true_cluster_set:
                 TP = TP + 1
         if len(predict_cluster) != 0:
             precision = TP / len(predict_cluster)
@@ -34,8 +36,9 @@ class evaluation:
 
     def recall_score(self, true_cluster, predict_cluster):
         TP = 0
+        predict_cluster_set = set(predict_cluster)
         for i in range(0, len(true_cluster)):
-            if true_cluster[i] in predict_cluster:
+            if true_cluster[i] in predict_cluster_set:
                 TP = TP + 1
         if len(true_cluster) != 0:
             recall = TP / len(true_cluster)
@@ -57,8 +60,9 @@ class evaluation:
 
     def accuracy_score(self, true_cluster, predict_cluster):
         correct = 0
+        true_cluster_set = set(true_cluster)
         for i in range(0, len(predict_cluster)):
-            if predict_cluster[i] in true_cluster:
+            if predict_cluster[i] in true_cluster_set:
                 correct = correct + 1
         if len(predict_cluster) != 0:
             accuracy = correct / len(predict_cluster)
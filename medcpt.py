@@ -5,9 +5,21 @@ My changes:
 - changed the values of some variables to match the directory structure
 - simplified the reading of files
 - added argparse
+- accepted any corpus name and fixed the medcpt directory in support_main()
+- counted the sentences in the packed tree store
+- wrote each pickle once, with checksums instead of reloading them when --verify is given
+- indexed the spans of each parser in get_support() and built the support as a matrix of spans by parsers
+- weighted and thresholded the support of the whole corpus at once in each iteration, splitting the selected spans
+  by sentence afterwards
+- loaded the unique cluster dictionaries of the parsers once and shared them between the weight estimations
+- stopped the weight iterations once the weights stop changing, recorded the number of iterations and the last change
+  of the weights, and aggregated the labels on the last iteration of the clusters if there are fewer than three
+- moved the work on each sentence into functions, kept the distances of the parsers as sufficient statistics and added
+  --incremental to aggregate new sentences without recomputing the earlier ones
+- aggregated the sentences on a process pool with --workers, reducing the distances and error rates in sentence order,
+  and removed get_input_parser_weight_log() and get_input_parser_weight_labels_log(), which this replaces
 """
 
-import pickle
 import os
 import numpy as np
 from compatibility import compatibility
@@ -15,182 +27,154 @@ from evaluation import evaluation
 from collections import Counter
 import math
 import argparse
-
-parser = argparse.ArgumentParser(description='Aggregate parse trees')
-parser.add_argument('--test_sentences', type=str, help='The set of test sentences to input',
-                    choices=['basic_VPE', 'callhome_non_VPE', 'callhome_VPE', 'coraal', 'non_VPE', 'VPE_examples'],
-                    default='basic_VPE')
-args = parser.parse_args()
-
+import copy
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from artifacts import load_pickle, save_pickle
+from corpus import add_corpus_arguments, corpus_name
+from tree_store import TreeStore
+
+# the weight iterations stop once no parser weight changes by more than TOLERANCE, or after MAX_ITERATIONS
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 5
+# sentences added with --incremental trigger a full recompute once any parser's share of the total weight has moved by
+# more than DRIFT since the last full run
+DRIFT = 0.05
 
 class medcpt:
     def __init__(self, cluster_span, cluster_pos):
         self.cluster_span = cluster_span
         self.cluster_pos = cluster_pos
-    def get_unique_cluster_span(self, cluster_span, cluster_pos):
-        unique_cluster_span = []
+    def get_unique_cluster_index(self, cluster_span):
+        # the positions of each distinct span, in order of first appearance
+        unique_cluster_index = {}
         for j in range(0, len(cluster_span)):
-            if cluster_span[j] not in unique_cluster_span:
-                unique_cluster_span.append(cluster_span[j])
-        unique_pos_span = []
-        for k in range(0, len(unique_cluster_span)):
-            single_cluster_pos = []
-            for j in range(0, len(cluster_span)):
-                if cluster_span[j] == unique_cluster_span[k]:
-                    single_cluster_pos.append(cluster_pos[j])
-            unique_pos_span.append(single_cluster_pos)
+            unique_cluster_index.setdefault(cluster_span[j], []).append(j)
+        return list(unique_cluster_index.values())
+    def get_unique_cluster_span(self, cluster_span, cluster_pos):
+        unique_cluster_index = self.get_unique_cluster_index(cluster_span=cluster_span)
+        unique_cluster_span = [cluster_span[index[0]] for index in unique_cluster_index]
+        unique_pos_span = [[cluster_pos[j] for j in index] for index in unique_cluster_index]
         self.unique_cluster_span = unique_cluster_span
         self.unique_pos_span = unique_pos_span
         return unique_cluster_span, unique_pos_span
     def get_support(self, loop_dictionary, input_parser_count, current_sentence_count):
-        total_cluster_span = []
-        for f in range(0, input_parser_count):
-            unique_cluster_span = loop_dictionary[f]['dictionary'][current_sentence_count]['unique_cluster_span']
-            total_cluster_span = total_cluster_span + unique_cluster_span
-
-        total_unique_cluster_span = []
-        for i in range(0, len(total_cluster_span)):
-            if total_cluster_span[i] not in total_unique_cluster_span:
-                total_unique_cluster_span.append(total_cluster_span[i])
-
-        total_unique_cluster_support = []
+        parser_clusters = [loop_dictionary[f]['dictionary'][current_sentence_count] for f in range(0, input_parser_count)]
+
+        # position of each span in the unique spans of every parser, and all spans in order of first appearance
+        parser_span_index = []
+        total_unique_cluster_index = {}
+        for clusters in parser_clusters:
+            parser_span_index.append({span: j for j, span in enumerate(clusters['unique_cluster_span'])})
+            for span in clusters['unique_cluster_span']:
+                total_unique_cluster_index.setdefault(span, len(total_unique_cluster_index))
+        total_unique_cluster_span = list(total_unique_cluster_index)
+
+        total_unique_cluster_support = np.zeros((len(total_unique_cluster_span), input_parser_count), dtype=np.int64)
         total_unique_cluster_pos = []
-        for i in range(0, len(total_unique_cluster_span)):
-            support = []
+        for i, span in enumerate(total_unique_cluster_span):
             pos = []
-            boolean = False
-            for f in range(0, input_parser_count):
-                unique_cluster_span = loop_dictionary[f]['dictionary'][current_sentence_count]['unique_cluster_span']
-                unique_pos_span = loop_dictionary[f]['dictionary'][current_sentence_count]['unique_pos_span']
-                for j in range(0, len(unique_cluster_span)):
-                    boolean = False
-                    if unique_cluster_span[j] == total_unique_cluster_span[i]:
-                        support.append(1)
-                        pos.append(unique_pos_span[j])
-                        boolean = True
-                        break
-                if boolean == False:
-                    support.append(0)
-                    empty_array = []
-                    pos.append(empty_array)
-            if len(support) == input_parser_count:
-                total_unique_cluster_support.append(support)
-                total_unique_cluster_pos.append(pos)
-            else:
-                difference = input_parser_count - len(support)
-                for i in range(0, difference):
-                    support.append(0)
-                    empty_array = []
-                    pos.append(empty_array)
-                total_unique_cluster_support.append(support)
-                total_unique_cluster_pos.append(pos)
+            supported = False
+            for f, clusters in enumerate(parser_clusters):
+                # a parser without clusters after one that has the span was skipped by the original scan, which
+                # padded the support at the end instead
+                if supported and len(parser_span_index[f]) == 0:
+                    continue
+                j = parser_span_index[f].get(span)
+                supported = j is not None
+                if supported:
+                    total_unique_cluster_support[i, len(pos)] = 1
+                    pos.append(clusters['unique_pos_span'][j])
+                else:
+                    pos.append([])
+            for _ in range(len(pos), input_parser_count):
+                pos.append([])
+            total_unique_cluster_pos.append(pos)
 
         return total_unique_cluster_span, total_unique_cluster_support, total_unique_cluster_pos
 
-    def get_input_parser_weight_log(self, iteration, pickle_dataset_dump_directory, folders, sentence_count, medcpt_dictionary):
-        if iteration == 1:
-            input_parser_weight = [1] * len(folders)
-        else:
-            robinson_foulds_distance_array = []
-            for j in range(0, len(folders)):
-                folder = folders[j]
-                pickle_path = os.path.join(pickle_dataset_dump_directory, folder)
-                with open(os.path.join(pickle_path, 'unique_sentence_cluster_dictionary.pickle'), 'rb') as handle:
-                    unique_sentence_cluster_dictionary = pickle.load(handle)
-                robinson_foulds_distance = 0
-                for k in range(1, sentence_count + 1):
-                    true_cluster = medcpt_dictionary[k]['medcpt_clusters']
-                    predict_cluster = unique_sentence_cluster_dictionary[k]['unique_cluster_span']
-                    true_error = medcpt_dictionary[k]['error']
-                    predict_error = unique_sentence_cluster_dictionary[k]['error']
-                    if (true_error == False) and (predict_error == False):
-                        evaluation_object = evaluation(true_cluster=true_cluster, predict_cluster=predict_cluster)
-                        robinson_foulds_distance = robinson_foulds_distance + evaluation_object.robinson_foulds_distance(cluster1=true_cluster, cluster2=predict_cluster)
-                    elif (predict_error == False):
-                        robinson_foulds_distance = robinson_foulds_distance + len(true_cluster)
-                robinson_foulds_distance_array.append(robinson_foulds_distance)
-        if iteration != 1:
-            input_parser_weight = []
-            max_value = np.max(robinson_foulds_distance_array)
-
-            for a in range(0, len(robinson_foulds_distance_array)):
-                weight = -math.log(robinson_foulds_distance_array[a]/max_value + 1e-7)
-                input_parser_weight.append(weight)
+    def get_robinson_foulds_distance(self, unique_sentence_cluster_dictionary, sentences, medcpt_dictionary):
+        robinson_foulds_distance = 0
+        for k in sentences:
+            true_cluster = medcpt_dictionary[k]['medcpt_clusters']
+            predict_cluster = unique_sentence_cluster_dictionary[k]['unique_cluster_span']
+            true_error = medcpt_dictionary[k]['error']
+            predict_error = unique_sentence_cluster_dictionary[k]['error']
+            if (true_error == False) and (predict_error == False):
+                evaluation_object = evaluation(true_cluster=true_cluster, predict_cluster=predict_cluster)
+                robinson_foulds_distance = robinson_foulds_distance + evaluation_object.robinson_foulds_distance(cluster1=true_cluster, cluster2=predict_cluster)
+            elif (predict_error == False):
+                robinson_foulds_distance = robinson_foulds_distance + len(true_cluster)
+        return robinson_foulds_distance
+
+    def get_error_rate_label(self, unique_sentence_cluster_dictionary, sentences, medcpt_dictionary):
+        error_rate_label = []
+        for k in sentences:
+            true_cluster = medcpt_dictionary[k]['medcpt_clusters']
+            predict_cluster = unique_sentence_cluster_dictionary[k]['unique_cluster_span']
+            true_label = medcpt_dictionary[k]['pos_aggregation']
+            predict_label = unique_sentence_cluster_dictionary[k]['unique_pos_span']
+            true_error = medcpt_dictionary[k]['error']
+            predict_error = unique_sentence_cluster_dictionary[k]['error']
+
+            if (true_error == False) and (predict_error == False):
+                evaluation_object = evaluation(true_cluster=true_cluster, predict_cluster=predict_cluster)
+                error_rate_label.append(
+                    evaluation_object.error_rate_label(true_cluster=true_cluster, true_label=true_label,
+                                                           predict_cluster=predict_cluster,
+                                                           predict_label=predict_label))
+        return error_rate_label
+
+    def get_log_weight(self, error_array):
+        input_parser_weight = []
+        max_value = np.max(error_array)
+        for a in range(0, len(error_array)):
+            weight = -math.log(error_array[a]/max_value + 1e-7)
+            input_parser_weight.append(weight)
         return input_parser_weight
 
-    def get_input_parser_weight_labels_log(self, iteration, pickle_dataset_dump_directory, folders, sentence_count, medcpt_dictionary):
-        if iteration == 1:
-            input_parser_label_weight = [1] * len(folders)
-        else:
-            error_rate_array = []
-            for j in range(0, len(folders)):
-                folder = folders[j]
-                pickle_path = os.path.join(pickle_dataset_dump_directory, folder)
-                with open(os.path.join(pickle_path, 'unique_sentence_cluster_dictionary.pickle'), 'rb') as handle:
-                    unique_sentence_cluster_dictionary = pickle.load(handle)
-                error_rate_label = []
-                for k in range(1, sentence_count + 1):
-                    true_cluster = medcpt_dictionary[k]['medcpt_clusters']
-                    predict_cluster = unique_sentence_cluster_dictionary[k]['unique_cluster_span']
-                    true_label = medcpt_dictionary[k]['pos_aggregation']
-                    predict_label = unique_sentence_cluster_dictionary[k]['unique_pos_span']
-                    true_error = medcpt_dictionary[k]['error']
-                    predict_error = unique_sentence_cluster_dictionary[k]['error']
-
-                    if (true_error == False) and (predict_error == False):
-                        evaluation_object = evaluation(true_cluster=true_cluster, predict_cluster=predict_cluster)
-                        error_rate_label.append(
-                            evaluation_object.error_rate_label(true_cluster=true_cluster, true_label=true_label,
-                                                                   predict_cluster=predict_cluster,
-                                                                   predict_label=predict_label))
-
-                mean_error_rate = np.mean(error_rate_label)
-
-                error_rate_array.append(mean_error_rate)
-
-        if iteration != 1:
-            input_parser_label_weight = []
-            max_value = np.max(error_rate_array)
-            for a in range(0, len(error_rate_array)):
-                weight = -math.log(error_rate_array[a]/max_value + 1e-7)
-                input_parser_label_weight.append(weight)
-
-        return input_parser_label_weight
+    def get_weighted_support(self, input_parser_weight, total_unique_cluster_support):
+        support = np.asarray(total_unique_cluster_support, dtype=np.float64).reshape(-1, len(input_parser_weight))
+        # summed parser by parser like the original loop over each span, so that the results are the same
+        cluster_weight = np.zeros(len(support))
+        for j in range(0, len(input_parser_weight)):
+            cluster_weight = cluster_weight + support[:, j] * input_parser_weight[j]
+        return cluster_weight / np.sum(input_parser_weight)
+
+    def select_cluster_index(self, weighted_support, total_unique_cluster_span):
+        return self.select_thresholded_cluster_index(
+            majority_cluster_index=np.flatnonzero(weighted_support > 0.5).tolist(),
+            tie_cluster_index=np.flatnonzero(weighted_support == 0.5).tolist(),
+            total_unique_cluster_span=total_unique_cluster_span)
+
+    def select_thresholded_cluster_index(self, majority_cluster_index, tie_cluster_index, total_unique_cluster_span):
+        medcpt_cluster_index = list(majority_cluster_index)
+
+        temp_cluster_index = tie_cluster_index
+        if len(temp_cluster_index) > 0:
+            temp_cluster_array = [total_unique_cluster_span[i] for i in temp_cluster_index]
+            compatibility_object = compatibility(temp_cluster_array=temp_cluster_array)
+            compatible_cluster_index = compatibility_object.compatible_cluster_index(temp_cluster_array=temp_cluster_array)
+
+            for i in range(0, len(compatible_cluster_index)):
+                medcpt_cluster_index.append(temp_cluster_index[compatible_cluster_index[i]])
+
+        return medcpt_cluster_index
+
+    def select_clusters(self, weighted_support, total_unique_cluster_span, total_unique_cluster_pos):
+        medcpt_cluster_index = self.select_cluster_index(weighted_support=weighted_support,
+                                                         total_unique_cluster_span=total_unique_cluster_span)
+        medcpt_clusters = [total_unique_cluster_span[i] for i in medcpt_cluster_index]
+        medcpt_pos = [total_unique_cluster_pos[i] for i in medcpt_cluster_index]
+        return medcpt_clusters, medcpt_pos
 
     def aggregate_clusters(self, input_parser_weight, total_unique_cluster_span, total_unique_cluster_support, total_unique_cluster_pos, error):
         if error == False:
-            weighted_support = []
-            sum_parser_weight = np.sum(input_parser_weight)
-
-            for i in range(0, len(total_unique_cluster_support)):
-                cluster_weight = 0
-                for j in range(0, len(total_unique_cluster_support[i])):
-                    cluster_weight = cluster_weight + total_unique_cluster_support[i][j] * input_parser_weight[j]
-                cluster_support = cluster_weight/sum_parser_weight
-                weighted_support.append(cluster_support)
-
-            medcpt_clusters = []
-            medcpt_pos = []
-            temp_cluster_array = []
-            temp_cluster_pos = []
-            for i in range(0, len(weighted_support)):
-                if weighted_support[i] > 0.5:
-                    medcpt_clusters.append(total_unique_cluster_span[i])
-                    medcpt_pos.append(total_unique_cluster_pos[i])
-                elif weighted_support[i] == 0.5:
-                    temp_cluster_array.append(total_unique_cluster_span[i])
-                    temp_cluster_pos.append(total_unique_cluster_pos[i])
-
-
-            if len(temp_cluster_array) > 0:
-                compatibility_object = compatibility(temp_cluster_array=temp_cluster_array)
-                compatible_cluster_index = compatibility_object.compatible_cluster_index(temp_cluster_array=temp_cluster_array)
-
-                for i in range(0, len(compatible_cluster_index)):
-                    medcpt_clusters.append(temp_cluster_array[compatible_cluster_index[i]])
-                    medcpt_pos.append(temp_cluster_pos[compatible_cluster_index[i]])
-
-            return medcpt_clusters, medcpt_pos
+            weighted_support = self.get_weighted_support(input_parser_weight=input_parser_weight,
+                                                         total_unique_cluster_support=total_unique_cluster_support)
+            return self.select_clusters(weighted_support=weighted_support,
+                                        total_unique_cluster_span=total_unique_cluster_span,
+                                        total_unique_cluster_pos=total_unique_cluster_pos)
         else:
             medcpt_clusters = []
             medcpt_pos = []
@@ -223,242 +207,546 @@ class medcpt:
 
         return pos_aggregation
 
-    def aggregate_pos_labels(self, medcpt_pos, input_parser_weight):
-        pos_aggregation = []
+    def aggregate_pos_label_index(self, medcpt_pos, input_parser_weight):
+        # the aggregated labels of each cluster as (parser, label) positions in medcpt_pos
+        pos_aggregation_index = []
         for i in range(0, len(medcpt_pos)):
             support = []
-            pos_labels = []
-            weight_pos = []
+            unique_pos_labels = []
+            unique_pos_index = []
+            unique_pos_position = {}
             internal_count_array = []
             for j in range(0, len(medcpt_pos[i])):
                 internal_count_array.append(len(medcpt_pos[i][j]))
                 for k in range(0, len(medcpt_pos[i][j])):
-                    pos_labels.append(medcpt_pos[i][j][k])
-                    weight_pos.append(input_parser_weight[j])
-            unique_pos_labels = []
-            for a in range(0, len(pos_labels)):
-                if pos_labels[a] not in unique_pos_labels:
-                    unique_pos_labels.append(pos_labels[a])
-                    support.append(weight_pos[a])
-                else:
-                    for b in range(0, len(unique_pos_labels)):
-                        if unique_pos_labels[b] == pos_labels[a]:
-                            support[b] = support[b] + weight_pos[a]
+                    pos_label = medcpt_pos[i][j][k]
+                    if pos_label not in unique_pos_position:
+                        unique_pos_position[pos_label] = len(unique_pos_labels)
+                        unique_pos_labels.append(pos_label)
+                        unique_pos_index.append((j, k))
+                        support.append(input_parser_weight[j])
+                    else:
+                        b = unique_pos_position[pos_label]
+                        support[b] = support[b] + input_parser_weight[j]
 
             c = Counter(internal_count_array)
             pos_labels_number = c.most_common(1)[0][0]
             if pos_labels_number == 0:
                 pos_labels_number = 1
-            sorted_unique_pos_labels = [x for _, x in sorted(zip(support, unique_pos_labels), reverse=True)]
-            aggregate_pos = sorted_unique_pos_labels[:pos_labels_number]
-            pos_aggregation.append(aggregate_pos)
+            sorted_unique_pos_index = sorted(range(0, len(unique_pos_labels)),
+                                             key=lambda b: (support[b], unique_pos_labels[b]), reverse=True)
+            pos_aggregation_index.append([unique_pos_index[b] for b in sorted_unique_pos_index[:pos_labels_number]])
 
-        return pos_aggregation
+        return pos_aggregation_index
 
+    def get_pos_labels(self, medcpt_pos, pos_aggregation_index):
+        return [[medcpt_pos[i][j][k] for j, k in pos_aggregation_index[i]] for i in range(0, len(medcpt_pos))]
+
+    def aggregate_pos_labels(self, medcpt_pos, input_parser_weight):
+        pos_aggregation_index = self.aggregate_pos_label_index(medcpt_pos=medcpt_pos,
+                                                               input_parser_weight=input_parser_weight)
+        return self.get_pos_labels(medcpt_pos=medcpt_pos, pos_aggregation_index=pos_aggregation_index)
 
-def medcpt_aggregate_labels(input_directory, folders, sentence_count):
+def load_unique_cluster_dictionaries(input_directory, folders, verify=False):
+    pickle_dataset_dump_directory = os.path.join("dictionary_pickle_files", input_directory)
+    return [load_pickle(os.path.join(pickle_dataset_dump_directory, folder, 'unique_sentence_cluster_dictionary.pickle'),
+                        verify) for folder in folders]
+
+
+# the dictionaries a stage reads, set in each worker process by the pool initializer, or in this process when the
+# sentences are processed serially
+stage_data = {}
+
+
+def set_stage_data(data):
+    global stage_data
+    stage_data = data
+
+
+def sentence_map(workers, data, sentence_count):
+    # the workers only send back positions and numbers, from which the sentences are built here out of the same objects
+    # as in a serial run, so that the pickles are identical
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=set_stage_data, initargs=(data,))
+        return functools.partial(executor.map, chunksize=max(1, sentence_count // (workers * 4))), executor
+    set_stage_data(data)
+    return map, None
+
+
+def unique_sentence_cluster_index(k):
+    sentence_cluster = stage_data['sentence_cluster_dictionary'][k]
+    if sentence_cluster['error']:
+        return []
+    medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
+    return medcpt_object.get_unique_cluster_index(cluster_span=sentence_cluster['cluster_span'])
+
+
+def unique_sentence_clusters(sentence_cluster, unique_cluster_index):
+    cluster_span = sentence_cluster['cluster_span']
+    cluster_pos = sentence_cluster['cluster_pos']
+    error = sentence_cluster['error']
+    unique_sentence_cluster = {}
+    if not error:
+        unique_sentence_cluster['unique_cluster_span'] = [cluster_span[index[0]] for index in unique_cluster_index]
+        unique_sentence_cluster['unique_pos_span'] = [[cluster_pos[j] for j in index] for index in unique_cluster_index]
+        unique_sentence_cluster['error'] = error
+    else:
+        unique_sentence_cluster['unique_cluster_span'] = []
+        unique_sentence_cluster['unique_pos_span'] = []
+        unique_sentence_cluster['error'] = error
+    return unique_sentence_cluster
+
+
+def unique_clusters(sentence_cluster_dictionary, sentences, workers=1):
+    map_function, executor = sentence_map(workers, {'sentence_cluster_dictionary': sentence_cluster_dictionary},
+                                          len(sentences))
+    unique_sentence_cluster_dictionary = {}
+    for k, unique_cluster_index in zip(sentences, map_function(unique_sentence_cluster_index, sentences)):
+        unique_sentence_cluster_dictionary[k] = unique_sentence_clusters(sentence_cluster_dictionary[k],
+                                                                         unique_cluster_index)
+    if executor is not None:
+        executor.shutdown()
+    return unique_sentence_cluster_dictionary
+
+
+def sentence_support(loop_dictionary, input_parser_count, current_sentence_count):
+    input_cluster_support = {}
+    medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
+    total_unique_cluster_span, total_unique_cluster_support, total_unique_cluster_pos = medcpt_object.get_support(loop_dictionary=loop_dictionary, input_parser_count=input_parser_count, current_sentence_count=current_sentence_count)
+    input_cluster_support['total_unique_cluster_span'] = total_unique_cluster_span
+    input_cluster_support['total_unique_cluster_support'] = total_unique_cluster_support.tolist()
+    input_cluster_support['total_unique_cluster_pos'] = total_unique_cluster_pos
+    error_boolean = False
+    for f in range(0, input_parser_count):
+        error = loop_dictionary[f]['dictionary'][current_sentence_count]['error']
+        if (error_boolean or error):
+            error_boolean = True
+    input_cluster_support['error'] = error_boolean
+    return input_cluster_support
+
+
+def stack_support(input_cluster_support_dictionary, sentences, input_parser_count):
+    # the support of the sentences stacked into one matrix; the spans of the i-th sentence are the rows
+    # sentence_offsets[i] to sentence_offsets[i+1]
+    corpus_support = []
+    sentence_offsets = [0]
+    for k in sentences:
+        corpus_support.extend(input_cluster_support_dictionary[k]['total_unique_cluster_support'])
+        sentence_offsets.append(len(corpus_support))
+    return np.asarray(corpus_support, dtype=np.float64).reshape(-1, input_parser_count), sentence_offsets
+
+
+def split_cluster_index(cluster_index, sentence_offsets):
+    # splits ascending row numbers of the stacked corpus by sentence, turning them into indices into the spans of each
+    # sentence
+    sentence_offsets = np.asarray(sentence_offsets)
+    bounds = np.searchsorted(cluster_index, sentence_offsets)
+    sentence_index = (cluster_index - np.repeat(sentence_offsets[:-1], np.diff(bounds))).tolist()
+    bounds = bounds.tolist()
+    return [sentence_index[bounds[i]:bounds[i+1]] for i in range(0, len(bounds) - 1)]
+
+
+def aggregate_sentence_cluster_index(k, majority_cluster_index, tie_cluster_index, input_parser_weight):
+    input_cluster_support = stage_data['input_cluster_support_dictionary'][k]
+    total_unique_cluster_span = input_cluster_support['total_unique_cluster_span']
+    total_unique_cluster_pos = input_cluster_support['total_unique_cluster_pos']
+    error = input_cluster_support['error']
+    medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
+
+    if error == False:
+        medcpt_cluster_index = medcpt_object.select_thresholded_cluster_index(
+            majority_cluster_index=majority_cluster_index, tie_cluster_index=tie_cluster_index,
+            total_unique_cluster_span=total_unique_cluster_span)
+    else:
+        medcpt_cluster_index = []
+    medcpt_pos = [total_unique_cluster_pos[i] for i in medcpt_cluster_index]
+    mv_pos_aggregation_index = medcpt_object.aggregate_pos_label_index(medcpt_pos=medcpt_pos, input_parser_weight= [1]*len(input_parser_weight))
+    weight_pos_aggregation_index = medcpt_object.aggregate_pos_label_index(medcpt_pos=medcpt_pos, input_parser_weight= input_parser_weight)
+
+    # the distance of each parser to this sentence, summed over the corpus for the weights of the next iteration
+    medcpt_sentence = {k: {'medcpt_clusters': [total_unique_cluster_span[i] for i in medcpt_cluster_index],
+                           'error': error}}
+    robinson_foulds_distances = [medcpt_object.get_robinson_foulds_distance(
+        unique_sentence_cluster_dictionary=unique_sentence_cluster_dictionary, sentences=[k],
+        medcpt_dictionary=medcpt_sentence)
+        for unique_sentence_cluster_dictionary in stage_data['unique_sentence_cluster_dictionaries']]
+    return medcpt_cluster_index, mv_pos_aggregation_index, weight_pos_aggregation_index, robinson_foulds_distances
+
+
+def aggregate_clusters_iteration(map_function, sentences, input_cluster_support_dictionary, corpus_support,
+                                 sentence_offsets, input_parser_weight):
+    medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
+    corpus_weighted_support = medcpt_object.get_weighted_support(input_parser_weight=input_parser_weight,
+                                                                 total_unique_cluster_support=corpus_support)
+    # thresholded once over the whole corpus; only the compatibility of the spans with a support of exactly one half is
+    # checked sentence by sentence
+    majority_cluster_indices = split_cluster_index(np.flatnonzero(corpus_weighted_support > 0.5), sentence_offsets)
+    tie_cluster_indices = split_cluster_index(np.flatnonzero(corpus_weighted_support == 0.5), sentence_offsets)
+    results = map_function(aggregate_sentence_cluster_index, sentences, majority_cluster_indices, tie_cluster_indices,
+                           [input_parser_weight] * len(sentences))
+
+    medcpt_iteration = {}
+    robinson_foulds_distance_array = [0] * len(input_parser_weight)
+    for k, (medcpt_cluster_index, mv_pos_aggregation_index, weight_pos_aggregation_index,
+            robinson_foulds_distances) in zip(sentences, results):
+        total_unique_cluster_span = input_cluster_support_dictionary[k]['total_unique_cluster_span']
+        total_unique_cluster_pos = input_cluster_support_dictionary[k]['total_unique_cluster_pos']
+        medcpt_pos = [total_unique_cluster_pos[i] for i in medcpt_cluster_index]
+
+        medcpt_iteration[k] = {}
+        medcpt_iteration[k]['medcpt_clusters'] = [total_unique_cluster_span[i] for i in medcpt_cluster_index]
+        medcpt_iteration[k]['medcpt_pos'] = medcpt_pos
+        medcpt_iteration[k]['mv_pos_aggregation'] = medcpt_object.get_pos_labels(medcpt_pos=medcpt_pos, pos_aggregation_index=mv_pos_aggregation_index)
+        medcpt_iteration[k]['weight_pos_aggregation'] = medcpt_object.get_pos_labels(medcpt_pos=medcpt_pos, pos_aggregation_index=weight_pos_aggregation_index)
+        medcpt_iteration[k]['error'] = input_cluster_support_dictionary[k]['error']
+        for j in range(0, len(robinson_foulds_distances)):
+            robinson_foulds_distance_array[j] = robinson_foulds_distance_array[j] + robinson_foulds_distances[j]
+        print(k)
+    return medcpt_iteration, robinson_foulds_distance_array
+
+
+def aggregate_sentence_label_index(k, input_parser_label_weight):
+    medcpt_sentence = stage_data['medcpt_dictionary'][k]
+    medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
+    pos_aggregation_index = medcpt_object.aggregate_pos_label_index(medcpt_pos=medcpt_sentence['medcpt_pos'],
+                                                                    input_parser_weight=input_parser_label_weight)
+
+    # the label error rate of each parser on this sentence, if it has one, for the weights of the next iteration
+    medcpt_label_sentence = {k: {'medcpt_clusters': medcpt_sentence['medcpt_clusters'],
+                                 'pos_aggregation': medcpt_object.get_pos_labels(
+                                     medcpt_pos=medcpt_sentence['medcpt_pos'],
+                                     pos_aggregation_index=pos_aggregation_index),
+                                 'error': medcpt_sentence['error']}}
+    error_rates = [medcpt_object.get_error_rate_label(
+        unique_sentence_cluster_dictionary=unique_sentence_cluster_dictionary, sentences=[k],
+        medcpt_dictionary=medcpt_label_sentence)
+        for unique_sentence_cluster_dictionary in stage_data['unique_sentence_cluster_dictionaries']]
+    return pos_aggregation_index, error_rates
+
+
+def aggregate_labels_iteration(map_function, sentences, medcpt_dictionary, input_parser_label_weight):
+    medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
+    results = map_function(aggregate_sentence_label_index, sentences,
+                           [input_parser_label_weight] * len(sentences))
+
+    medcpt_label_iteration = {}
+    error_rate_label_array = [[] for _ in input_parser_label_weight]
+    for k, (pos_aggregation_index, error_rates) in zip(sentences, results):
+        medcpt_pos = medcpt_dictionary[k]['medcpt_pos']
+        medcpt_label_iteration[k] = {}
+        medcpt_label_iteration[k]['medcpt_clusters'] = medcpt_dictionary[k]['medcpt_clusters']
+        medcpt_label_iteration[k]['medcpt_pos'] = medcpt_pos
+        medcpt_label_iteration[k]['pos_aggregation'] = medcpt_object.get_pos_labels(medcpt_pos=medcpt_pos, pos_aggregation_index=pos_aggregation_index)
+        medcpt_label_iteration[k]['error'] = medcpt_dictionary[k]['error']
+        for j in range(0, len(error_rates)):
+            error_rate_label_array[j].extend(error_rates[j])
+        print(k)
+    return medcpt_label_iteration, error_rate_label_array
+
+
+def label_cluster_iteration(medcpt_aggregate_clusters_dictionary):
+    # the labels are aggregated on the third iteration of the clusters as in the original, or on the last one if the
+    # weights converged before it
+    return min(3, medcpt_aggregate_clusters_dictionary['iterations'])
+
+
+def medcpt_aggregate_labels(input_directory, folders, sentence_count, verify=False,
+                            unique_sentence_cluster_dictionaries=None, tolerance=TOLERANCE,
+                            max_iterations=MAX_ITERATIONS, workers=1):
     pickle_dump_directory = "dictionary_pickle_files/"
-    pickle_dataset_dump_directory = os.path.join(pickle_dump_directory, input_directory)
+    if unique_sentence_cluster_dictionaries is None:
+        unique_sentence_cluster_dictionaries = load_unique_cluster_dictionaries(input_directory, folders, verify)
     medcpt_directory = os.path.join(pickle_dump_directory, input_directory, 'medcpt')
-    with open(os.path.join(medcpt_directory, 'medcpt_aggregate_clusters_dictionary_log.pickle'), 'rb') as handle:
-        medcpt_aggregate_clusters_dictionary = pickle.load(handle)
+    medcpt_aggregate_clusters_dictionary = load_pickle(
+        os.path.join(medcpt_directory, 'medcpt_aggregate_clusters_dictionary_log.pickle'), verify)
 
     iteration = 1
-    medcpt_iteration = 3
+    medcpt_iteration = label_cluster_iteration(medcpt_aggregate_clusters_dictionary)
     medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
     medcpt_aggregate_labels_dictionary = {}
-    input_parser_label_weight = medcpt_object.get_input_parser_weight_labels_log(iteration=iteration,
-                                                                    pickle_dataset_dump_directory=pickle_dataset_dump_directory,
-                                                                    folders=folders, sentence_count=sentence_count,
-                                                                    medcpt_dictionary=medcpt_aggregate_labels_dictionary)
+    sentences = range(1, sentence_count + 1)
+    map_function, executor = sentence_map(workers, {
+        'medcpt_dictionary': medcpt_aggregate_clusters_dictionary[medcpt_iteration],
+        'unique_sentence_cluster_dictionaries': unique_sentence_cluster_dictionaries}, sentence_count)
+    input_parser_label_weight = [1] * len(folders)
     previous_input_parser_weight = [0] * len(folders)
     weight_vector_prev_iteration = np.asarray(previous_input_parser_weight)
     weight_vector_this_iteration = np.asarray(input_parser_label_weight)
-    while (iteration < 6):
+    while (iteration <= max_iterations):
         weight_vector_prev_iteration = weight_vector_this_iteration
-        medcpt_aggregate_labels_dictionary[iteration] = {}
-        for k in range(1, sentence_count + 1):
-            medcpt_clusters = medcpt_aggregate_clusters_dictionary[medcpt_iteration][k]['medcpt_clusters']
-            medcpt_pos = medcpt_aggregate_clusters_dictionary[medcpt_iteration][k]['medcpt_pos']
-            error = medcpt_aggregate_clusters_dictionary[medcpt_iteration][k]['error']
-
-            pos_aggregation = medcpt_object.aggregate_pos_labels(medcpt_pos=medcpt_pos,
-                                                                 input_parser_weight=input_parser_label_weight)
-
-            medcpt_aggregate_labels_dictionary[iteration][k] = {}
-            medcpt_aggregate_labels_dictionary[iteration][k]['medcpt_clusters'] = medcpt_clusters
-            medcpt_aggregate_labels_dictionary[iteration][k]['medcpt_pos'] = medcpt_pos
-            medcpt_aggregate_labels_dictionary[iteration][k]['pos_aggregation'] = pos_aggregation
-            medcpt_aggregate_labels_dictionary[iteration][k]['error'] = error
-            print(k)
+        medcpt_aggregate_labels_dictionary[iteration], error_rate_label_array = aggregate_labels_iteration(
+            map_function, sentences, medcpt_aggregate_clusters_dictionary[medcpt_iteration], input_parser_label_weight)
         medcpt_aggregate_labels_dictionary[iteration]['input_parser_label_weight'] = input_parser_label_weight
         iteration = iteration + 1
-        input_parser_label_weight = medcpt_object.get_input_parser_weight_labels_log(iteration=iteration,
-                                                                        pickle_dataset_dump_directory=pickle_dataset_dump_directory,
-                                                                        folders=folders,
-                                                                        sentence_count=sentence_count,
-                                                                        medcpt_dictionary=
-                                                                        medcpt_aggregate_labels_dictionary[
-                                                                            iteration - 1])
+        error_rate_array = [np.mean(error_rate_label) for error_rate_label in error_rate_label_array]
+        input_parser_label_weight = medcpt_object.get_log_weight(error_rate_array)
         weight_vector_this_iteration = np.asarray(input_parser_label_weight)
         print(input_parser_label_weight)
-    with open(str(medcpt_directory) + '/medcpt_aggregate_labels_dictionary_log.pickle', 'wb') as handle:
-        pickle.dump(medcpt_aggregate_labels_dictionary, handle, protocol=pickle.HIGHEST_PROTOCOL)
-
-    with open(str(medcpt_directory) + '/medcpt_aggregate_labels_dictionary_log.pickle', 'rb') as handle:
-        medcpt_aggregate_labels_dictionary_pickle = pickle.load(handle)
-
-    print(medcpt_aggregate_labels_dictionary_pickle == medcpt_aggregate_labels_dictionary)
+        delta = float(np.max(np.abs(weight_vector_this_iteration - weight_vector_prev_iteration)))
+        if delta <= tolerance:
+            break
+    if executor is not None:
+        executor.shutdown()
+    medcpt_aggregate_labels_dictionary['iterations'] = iteration - 1
+    medcpt_aggregate_labels_dictionary['delta'] = delta
+    medcpt_aggregate_labels_dictionary['sentence_count'] = sentence_count
+    medcpt_aggregate_labels_dictionary['error_rate_label_sum'] = [float(np.sum(error_rate_label))
+                                                                  for error_rate_label in error_rate_label_array]
+    medcpt_aggregate_labels_dictionary['error_rate_label_count'] = [len(error_rate_label)
+                                                                    for error_rate_label in error_rate_label_array]
+    medcpt_aggregate_labels_dictionary['reference_parser_label_weight'] = \
+        medcpt_aggregate_labels_dictionary[iteration - 1]['input_parser_label_weight']
+    print('Stopped after ' + str(iteration - 1) + ' iterations with a weight change of ' + str(delta))
+    save_pickle(medcpt_aggregate_labels_dictionary,
+                os.path.join(medcpt_directory, 'medcpt_aggregate_labels_dictionary_log.pickle'), verify)
 
     return True
 
 
-def medcpt_aggregate_clusters(input_directory, folders, sentence_count):
+def medcpt_aggregate_clusters(input_directory, folders, sentence_count, verify=False,
+                              unique_sentence_cluster_dictionaries=None, tolerance=TOLERANCE,
+                              max_iterations=MAX_ITERATIONS, workers=1):
     pickle_dump_directory = "dictionary_pickle_files"
+    if unique_sentence_cluster_dictionaries is None:
+        unique_sentence_cluster_dictionaries = load_unique_cluster_dictionaries(input_directory, folders, verify)
 
-    pickle_dataset_dump_directory = os.path.join(pickle_dump_directory, input_directory)
     medcpt_directory = os.path.join(pickle_dump_directory, input_directory, 'medcpt')
-    with open(os.path.join(medcpt_directory, 'input_cluster_support_dictionary.pickle'), 'rb') as handle:
-        input_cluster_support_dictionary = pickle.load(handle)
+    input_cluster_support_dictionary = load_pickle(
+        os.path.join(medcpt_directory, 'input_cluster_support_dictionary.pickle'), verify)
 
     iteration = 1
     medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
     medcpt_aggregate_clusters_dictionary = {}
-    input_parser_weight = medcpt_object.get_input_parser_weight_log(iteration=iteration, pickle_dataset_dump_directory= pickle_dataset_dump_directory, folders=folders, sentence_count=sentence_count, medcpt_dictionary=medcpt_aggregate_clusters_dictionary)
+    sentences = range(1, sentence_count + 1)
+    corpus_support, sentence_offsets = stack_support(input_cluster_support_dictionary, sentences, len(folders))
+    map_function, executor = sentence_map(workers, {
+        'input_cluster_support_dictionary': input_cluster_support_dictionary,
+        'unique_sentence_cluster_dictionaries': unique_sentence_cluster_dictionaries}, sentence_count)
+    input_parser_weight = [1] * len(folders)
     previous_input_parser_weight = [0]*len(folders)
     weight_vector_prev_iteration = np.asarray(previous_input_parser_weight)
     weight_vector_this_iteration = np.asarray(input_parser_weight)
-    while (iteration < 6):
+    while (iteration <= max_iterations):
         weight_vector_prev_iteration = weight_vector_this_iteration
-        medcpt_aggregate_clusters_dictionary[iteration] = {}
-        for k in range(1, sentence_count+1):
-            total_unique_cluster_span = input_cluster_support_dictionary[k]['total_unique_cluster_span']
-            total_unique_cluster_support = input_cluster_support_dictionary[k]['total_unique_cluster_support']
-            total_unique_cluster_pos = input_cluster_support_dictionary[k]['total_unique_cluster_pos']
-            error = input_cluster_support_dictionary[k]['error']
-
-            medcpt_clusters, medcpt_pos = medcpt_object.aggregate_clusters(input_parser_weight= input_parser_weight, total_unique_cluster_span=total_unique_cluster_span, total_unique_cluster_support=total_unique_cluster_support,
-                                                                           total_unique_cluster_pos=total_unique_cluster_pos, error=error)
-
-            mv_pos_aggregation = medcpt_object.aggregate_pos_labels(medcpt_pos=medcpt_pos, input_parser_weight= [1]*len(folders))
-            weight_pos_aggregation = medcpt_object.aggregate_pos_labels(medcpt_pos=medcpt_pos, input_parser_weight= input_parser_weight)
-
-            medcpt_aggregate_clusters_dictionary[iteration][k] = {}
-            medcpt_aggregate_clusters_dictionary[iteration][k]['medcpt_clusters'] = medcpt_clusters
-            medcpt_aggregate_clusters_dictionary[iteration][k]['medcpt_pos'] = medcpt_pos
-            medcpt_aggregate_clusters_dictionary[iteration][k]['mv_pos_aggregation'] = mv_pos_aggregation
-            medcpt_aggregate_clusters_dictionary[iteration][k]['weight_pos_aggregation'] = weight_pos_aggregation
-            medcpt_aggregate_clusters_dictionary[iteration][k]['error'] = error
-            print(k)
+        medcpt_aggregate_clusters_dictionary[iteration], robinson_foulds_distance_array = aggregate_clusters_iteration(
+            map_function, sentences, input_cluster_support_dictionary, corpus_support, sentence_offsets,
+            input_parser_weight)
         medcpt_aggregate_clusters_dictionary[iteration]['input_parser_weight'] = input_parser_weight
         iteration = iteration + 1
-        input_parser_weight = medcpt_object.get_input_parser_weight_log(iteration=iteration,
-                                                                    pickle_dataset_dump_directory=pickle_dataset_dump_directory,
-                                                                    folders=folders,
-                                                                    sentence_count=sentence_count,
-                                                                    medcpt_dictionary=medcpt_aggregate_clusters_dictionary[iteration-1])
+        input_parser_weight = medcpt_object.get_log_weight(robinson_foulds_distance_array)
         weight_vector_this_iteration = np.asarray(input_parser_weight)
         print(input_parser_weight)
-    with open(str(medcpt_directory) + '/medcpt_aggregate_clusters_dictionary_log.pickle', 'wb') as handle:
-        pickle.dump(medcpt_aggregate_clusters_dictionary, handle, protocol=pickle.HIGHEST_PROTOCOL)
-
-    with open(str(medcpt_directory) + '/medcpt_aggregate_clusters_dictionary_log.pickle', 'rb') as handle:
-        medcpt_aggregate_clusters_dictionary_pickle = pickle.load(handle)
-
-    print(medcpt_aggregate_clusters_dictionary_pickle == medcpt_aggregate_clusters_dictionary)
+        delta = float(np.max(np.abs(weight_vector_this_iteration - weight_vector_prev_iteration)))
+        if delta <= tolerance:
+            break
+    if executor is not None:
+        executor.shutdown()
+    medcpt_aggregate_clusters_dictionary['iterations'] = iteration - 1
+    medcpt_aggregate_clusters_dictionary['delta'] = delta
+    medcpt_aggregate_clusters_dictionary['sentence_count'] = sentence_count
+    medcpt_aggregate_clusters_dictionary['robinson_foulds_distance'] = robinson_foulds_distance_array
+    medcpt_aggregate_clusters_dictionary['reference_parser_weight'] = \
+        medcpt_aggregate_clusters_dictionary[iteration - 1]['input_parser_weight']
+    print('Stopped after ' + str(iteration - 1) + ' iterations with a weight change of ' + str(delta))
+    save_pickle(medcpt_aggregate_clusters_dictionary,
+                os.path.join(medcpt_directory, 'medcpt_aggregate_clusters_dictionary_log.pickle'), verify)
 
     return True
 
 
-def unique_cluster_main(input_directory, folders, sentence_count):
+def unique_cluster_main(input_directory, folders, sentence_count, verify=False, workers=1):
     pickle_dump_directory = "dictionary_pickle_files/"
     directory = os.path.join(pickle_dump_directory, input_directory)
 
     for f, folder in enumerate(folders):
         pickle_path = os.path.join(directory, folder)
-        with open(str(pickle_path) + '/sentence_cluster_dictionary.pickle', 'rb') as handle:
-            sentence_cluster_dictionary = pickle.load(handle)
-        unique_sentence_cluster_dictionary = {}
-        for k in range(1, sentence_count+1):
-            cluster_span = sentence_cluster_dictionary[k]['cluster_span']
-            cluster_pos = sentence_cluster_dictionary[k]['cluster_pos']
-            error = sentence_cluster_dictionary[k]['error']
-            if not error:
-                medcpt_object = medcpt(cluster_span=cluster_span, cluster_pos=cluster_pos)
-                unique_cluster_span, unique_pos_span = medcpt_object.get_unique_cluster_span(cluster_span=cluster_span, cluster_pos=cluster_pos)
-                unique_sentence_cluster_dictionary[k] = {}
-                unique_sentence_cluster_dictionary[k]['unique_cluster_span'] = unique_cluster_span
-                unique_sentence_cluster_dictionary[k]['unique_pos_span'] = unique_pos_span
-                unique_sentence_cluster_dictionary[k]['error'] = error
-            else:
-                unique_sentence_cluster_dictionary[k] = {}
-                unique_sentence_cluster_dictionary[k]['unique_cluster_span'] = []
-                unique_sentence_cluster_dictionary[k]['unique_pos_span'] = []
-                unique_sentence_cluster_dictionary[k]['error'] = error
-
-        with open(str(pickle_path) + '/unique_sentence_cluster_dictionary.pickle', 'wb') as handle:
-            pickle.dump(unique_sentence_cluster_dictionary, handle, protocol=pickle.HIGHEST_PROTOCOL)
-
-        with open(str(pickle_path) + '/unique_sentence_cluster_dictionary.pickle', 'rb') as handle:
-            unique_sentence_cluster_dictionary_pickle = pickle.load(handle)
-
-        print(unique_sentence_cluster_dictionary_pickle == unique_sentence_cluster_dictionary)
+        sentence_cluster_dictionary = load_pickle(os.path.join(pickle_path, 'sentence_cluster_dictionary.pickle'), verify)
+        unique_sentence_cluster_dictionary = unique_clusters(sentence_cluster_dictionary,
+                                                             range(1, sentence_count+1), workers)
+
+        save_pickle(unique_sentence_cluster_dictionary,
+                    os.path.join(pickle_path, 'unique_sentence_cluster_dictionary.pickle'), verify)
 
     return True
 
 
-def support_main(input_directory, folders, sentence_count):
+def support_main(input_directory, folders, sentence_count, verify=False, unique_sentence_cluster_dictionaries=None):
     pickle_dump_directory = "dictionary_pickle_files/"
     directory = os.path.join(pickle_dump_directory, input_directory)
+    if unique_sentence_cluster_dictionaries is None:
+        unique_sentence_cluster_dictionaries = load_unique_cluster_dictionaries(input_directory, folders, verify)
 
     loop_dictionary = {}
-    for f, folder in enumerate(folders):
+    for f in range(0, len(folders)):
         loop_dictionary[f] = {}
-        pickle_path = os.path.join(directory, folder)
-        with open(str(pickle_path) + '/unique_sentence_cluster_dictionary.pickle', 'rb') as handle:
-            unique_sentence_cluster_dictionary = pickle.load(handle)
-        loop_dictionary[f]['dictionary'] = unique_sentence_cluster_dictionary
+        loop_dictionary[f]['dictionary'] = unique_sentence_cluster_dictionaries[f]
 
     input_cluster_support_dictionary = {}
     input_parser_count = len(folders)
     for k in range(1, sentence_count + 1):
-        current_sentence_count = k
-        input_cluster_support_dictionary[current_sentence_count] = {}
-        medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
-        total_unique_cluster_span, total_unique_cluster_support, total_unique_cluster_pos = medcpt_object.get_support(loop_dictionary=loop_dictionary, input_parser_count=input_parser_count, current_sentence_count=current_sentence_count)
-        input_cluster_support_dictionary[current_sentence_count]['total_unique_cluster_span'] = total_unique_cluster_span
-        input_cluster_support_dictionary[current_sentence_count]['total_unique_cluster_support'] = total_unique_cluster_support
-        input_cluster_support_dictionary[current_sentence_count]['total_unique_cluster_pos'] = total_unique_cluster_pos
-        error_boolean = False
-        for f in range(0, input_parser_count):
-            error = loop_dictionary[f]['dictionary'][current_sentence_count]['error']
-            if (error_boolean or error):
-                error_boolean = True
-        input_cluster_support_dictionary[current_sentence_count]['error'] = error_boolean
+        input_cluster_support_dictionary[k] = sentence_support(loop_dictionary, input_parser_count, k)
 
     if not os.path.exists(directory):
         os.mkdir(directory)
-    medcpt_directory = str(directory) + 'medcpt'
+    medcpt_directory = os.path.join(directory, 'medcpt')
     if not os.path.exists(medcpt_directory):
         os.mkdir(medcpt_directory)
 
-    with open(str(medcpt_directory) + '/input_cluster_support_dictionary.pickle', 'wb') as handle:
-        pickle.dump(input_cluster_support_dictionary, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    save_pickle(input_cluster_support_dictionary,
+                os.path.join(medcpt_directory, 'input_cluster_support_dictionary.pickle'), verify)
+
+    return True
+
 
-    with open(str(medcpt_directory) + '/input_cluster_support_dictionary.pickle', 'rb') as handle:
-        input_cluster_support_dictionary_pickle = pickle.load(handle)
+def weight_drift(input_parser_weight, reference_parser_weight):
+    weight_share = np.asarray(input_parser_weight) / np.sum(input_parser_weight)
+    reference_share = np.asarray(reference_parser_weight) / np.sum(reference_parser_weight)
+    return float(np.max(np.abs(weight_share - reference_share)))
 
-    print(input_cluster_support_dictionary_pickle == input_cluster_support_dictionary)
+
+def medcpt_incremental(input_directory, folders, sentence_count, verify=False, drift=DRIFT, workers=1):
+    # aggregates the sentences added since the last run on their own and updates the weights from the sufficient
+    # statistics of the earlier sentences; returns False when a full recompute is needed instead
+    pickle_dump_directory = "dictionary_pickle_files"
+    directory = os.path.join(pickle_dump_directory, input_directory)
+    medcpt_directory = os.path.join(directory, 'medcpt')
+    clusters_path = os.path.join(medcpt_directory, 'medcpt_aggregate_clusters_dictionary_log.pickle')
+    labels_path = os.path.join(medcpt_directory, 'medcpt_aggregate_labels_dictionary_log.pickle')
+    if not (os.path.exists(clusters_path) and os.path.exists(labels_path)):
+        print('No earlier run to add sentences to')
+        return False
+    medcpt_aggregate_clusters_dictionary = load_pickle(clusters_path, verify)
+    medcpt_aggregate_labels_dictionary = load_pickle(labels_path, verify)
+    if 'sentence_count' not in medcpt_aggregate_clusters_dictionary:
+        print('The earlier run did not record its sufficient statistics')
+        return False
+    previous_sentence_count = medcpt_aggregate_clusters_dictionary['sentence_count']
+    if sentence_count < previous_sentence_count:
+        print('Sentences were removed since the earlier run')
+        return False
+    sentences = range(previous_sentence_count + 1, sentence_count + 1)
+    if len(sentences) == 0:
+        print('No new sentences')
+        return True
+
+    unique_sentence_cluster_dictionaries = load_unique_cluster_dictionaries(input_directory, folders, verify)
+    for f, folder in enumerate(folders):
+        pickle_path = os.path.join(directory, folder)
+        sentence_cluster_dictionary = load_pickle(os.path.join(pickle_path, 'sentence_cluster_dictionary.pickle'), verify)
+        unique_sentence_cluster_dictionaries[f].update(unique_clusters(sentence_cluster_dictionary, sentences, workers))
+
+    loop_dictionary = {}
+    for f in range(0, len(folders)):
+        loop_dictionary[f] = {}
+        loop_dictionary[f]['dictionary'] = unique_sentence_cluster_dictionaries[f]
+    support_path = os.path.join(medcpt_directory, 'input_cluster_support_dictionary.pickle')
+    input_cluster_support_dictionary = load_pickle(support_path, verify)
+    for k in sentences:
+        input_cluster_support_dictionary[k] = sentence_support(loop_dictionary, len(folders), k)
+
+    # the new sentences are aggregated with the current weights, and their distances to the parsers are added to the
+    # statistics of the last iteration of the full run
+    medcpt_object = medcpt(cluster_span=[], cluster_pos=[])
+    final_iteration = medcpt_aggregate_clusters_dictionary[medcpt_aggregate_clusters_dictionary['iterations']]
+    corpus_support, sentence_offsets = stack_support(input_cluster_support_dictionary, sentences, len(folders))
+    map_function, executor = sentence_map(workers, {
+        'input_cluster_support_dictionary': input_cluster_support_dictionary,
+        'unique_sentence_cluster_dictionaries': unique_sentence_cluster_dictionaries}, len(sentences))
+    medcpt_iteration, robinson_foulds_distances = aggregate_clusters_iteration(
+        map_function, sentences, input_cluster_support_dictionary, corpus_support, sentence_offsets,
+        final_iteration['input_parser_weight'])
+    if executor is not None:
+        executor.shutdown()
+    final_iteration.update(medcpt_iteration)
+    # the labels of the new sentences are aggregated on the same iteration of the clusters as those of the earlier
+    # ones, to which the only clusters of the new sentences are added as well
+    label_iteration = medcpt_aggregate_clusters_dictionary[
+        label_cluster_iteration(medcpt_aggregate_clusters_dictionary)]
+    if label_iteration is not final_iteration:
+        label_iteration.update(copy.deepcopy(medcpt_iteration))
+    robinson_foulds_distance_array = list(medcpt_aggregate_clusters_dictionary['robinson_foulds_distance'])
+    for j in range(0, len(folders)):
+        robinson_foulds_distance_array[j] = robinson_foulds_distance_array[j] + robinson_foulds_distances[j]
+    input_parser_weight = medcpt_object.get_log_weight(robinson_foulds_distance_array)
+
+    final_label_iteration = medcpt_aggregate_labels_dictionary[medcpt_aggregate_labels_dictionary['iterations']]
+    map_function, executor = sentence_map(workers, {
+        'medcpt_dictionary': label_iteration,
+        'unique_sentence_cluster_dictionaries': unique_sentence_cluster_dictionaries}, len(sentences))
+    medcpt_label_iteration, error_rate_label_array = aggregate_labels_iteration(
+        map_function, sentences, label_iteration, final_label_iteration['input_parser_label_weight'])
+    if executor is not None:
+        executor.shutdown()
+    final_label_iteration.update(medcpt_label_iteration)
+    error_rate_label_sum = list(medcpt_aggregate_labels_dictionary['error_rate_label_sum'])
+    error_rate_label_count = list(medcpt_aggregate_labels_dictionary['error_rate_label_count'])
+    error_rate_array = []
+    for j in range(0, len(folders)):
+        error_rate_label_sum[j] = error_rate_label_sum[j] + float(np.sum(error_rate_label_array[j]))
+        error_rate_label_count[j] = error_rate_label_count[j] + len(error_rate_label_array[j])
+        error_rate_array.append(np.float64(error_rate_label_sum[j]) / error_rate_label_count[j])
+    input_parser_label_weight = medcpt_object.get_log_weight(error_rate_array)
+
+    cluster_drift = weight_drift(input_parser_weight, medcpt_aggregate_clusters_dictionary['reference_parser_weight'])
+    label_drift = weight_drift(input_parser_label_weight,
+                               medcpt_aggregate_labels_dictionary['reference_parser_label_weight'])
+    print('Added ' + str(len(sentences)) + ' sentences; the weights drifted by ' + str(cluster_drift) +
+          ' and the label weights by ' + str(label_drift))
+    if not (cluster_drift <= drift and label_drift <= drift):
+        return False
+
+    final_iteration['input_parser_weight'] = input_parser_weight
+    final_label_iteration['input_parser_label_weight'] = input_parser_label_weight
+    medcpt_aggregate_clusters_dictionary['sentence_count'] = sentence_count
+    medcpt_aggregate_clusters_dictionary['robinson_foulds_distance'] = robinson_foulds_distance_array
+    medcpt_aggregate_labels_dictionary['sentence_count'] = sentence_count
+    medcpt_aggregate_labels_dictionary['error_rate_label_sum'] = error_rate_label_sum
+    medcpt_aggregate_labels_dictionary['error_rate_label_count'] = error_rate_label_count
+
+    for f, folder in enumerate(folders):
+        save_pickle(unique_sentence_cluster_dictionaries[f],
+                    os.path.join(directory, folder, 'unique_sentence_cluster_dictionary.pickle'), verify)
+    save_pickle(input_cluster_support_dictionary, support_path, verify)
+    save_pickle(medcpt_aggregate_clusters_dictionary, clusters_path, verify)
+    save_pickle(medcpt_aggregate_labels_dictionary, labels_path, verify)
 
     return True
 
 
 if __name__ == '__main__':
-    folds = ["berkeley", "corenlp", "allennlp"]
-    input_dir = args.test_sentences
-    sents = len(os.listdir(os.path.join('dataset', input_dir, 'allennlp')))
+    parser = argparse.ArgumentParser(description='Aggregate parse trees')
+    add_corpus_arguments(parser)
+    parser.add_argument('--verify', action='store_true',
+                        help='Check the pickles against their checksums when loading them and record the checksums of '
+                             'the new ones')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='Stop iterating once no parser weight changes by more than this')
+    parser.add_argument('--max_iterations', type=int, default=MAX_ITERATIONS,
+                        help='The maximum number of weight iterations')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='The number of processes that aggregate the sentences')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only aggregate the sentences added since the last run, updating the weights from its '
+                             'statistics, unless the weights drift too far')
+    parser.add_argument('--drift', type=float, default=DRIFT,
+                        help='With --incremental, recompute everything once any parser\'s share of the total weight '
+                             'has moved by more than this since the last full run')
+    args = parser.parse_args()
+    if args.max_iterations < 1:
+        parser.error('--max_iterations must be at least 1')
 
-    run = unique_cluster_main(input_dir, folds, sents)
-    run1 = support_main(input_dir, folds, sents)
-    run2 = medcpt_aggregate_clusters(input_dir, folds, sents)
-    run3 = medcpt_aggregate_labels(input_dir, folds, sents)
+    folds = ["berkeley", "corenlp", "allennlp"]
+    input_dir = corpus_name(args.test_sentences, args.name)
+    sents = len(TreeStore(os.path.join('dataset', input_dir), read_only=True))
+
+    if not (args.incremental and medcpt_incremental(input_dir, folds, sents, args.verify, args.drift, args.workers)):
+        if args.incremental:
+            print('Recomputing all sentences')
+        run = unique_cluster_main(input_dir, folds, sents, args.verify, args.workers)
+        # read once and shared by the support and both weight estimations
+        unique_dictionaries = load_unique_cluster_dictionaries(input_dir, folds, args.verify)
+        run1 = support_main(input_dir, folds, sents, args.verify, unique_dictionaries)
+        run2 = medcpt_aggregate_clusters(input_dir, folds, sents, args.verify, unique_dictionaries, args.tolerance,
+                                         args.max_iterations, args.workers)
+        run3 = medcpt_aggregate_labels(input_dir, folds, sents, args.verify, unique_dictionaries, args.tolerance,
+                                       args.max_iterations, args.workers)
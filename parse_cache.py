@@ -0,0 +1,151 @@
+"""
+A persistent on-disk cache of parse trees, so that re-running the pipeline on the same sentences skips the parsers.
+Entries are addressed by the parser name, the model identifier and a hash of the normalized sentence, and the least
+recently used entries are evicted once the cache grows past its size cap.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+
+def normalize_sentence(s: str) -> str:
+    """
+    Normalizes a sentence before hashing so that differences in whitespace do not cause cache misses.
+
+    :param s: sentence
+    :return: normalized sentence
+    """
+    return ' '.join(s.split())
+
+
+def cache_key(parser_name: str, model: str, s: str) -> str:
+    """
+    Computes the content address of a parse.
+
+    :param parser_name: name of the parser
+    :param model: identifier of the parser model
+    :param s: sentence
+    :return: hexadecimal SHA-256 digest
+    """
+    sentence_hash = hashlib.sha256(normalize_sentence(s).encode('utf-8')).hexdigest()
+    return hashlib.sha256('\0'.join([parser_name, model, sentence_hash]).encode('utf-8')).hexdigest()
+
+
+class ParseCache:
+    def __init__(self, path: str, max_size: int):
+        """
+        Opens or creates a cache.
+
+        :param path: path to the SQLite file holding the cache
+        :param max_size: maximum total size of the cached trees in bytes
+        """
+        self.max_size = max_size
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS trees '
+                                 '(key TEXT PRIMARY KEY, tree TEXT, size INTEGER, last_used REAL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS trees_last_used ON trees (last_used)')
+        self._connection.commit()
+        # running total of the cached tree sizes, so that storing trees does not scan the whole table
+        self._total_size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM trees').fetchone()[0]
+
+    def get_many(self, parser_name: str, model: str, sentences: list) -> list:
+        """
+        Looks up the trees of several sentences and marks the hits as recently used.
+
+        :param parser_name: name of the parser
+        :param model: identifier of the parser model
+        :param sentences: sentences to look up
+        :return: tree in bracketed notation for each hit and None for each miss
+        """
+        keys = [cache_key(parser_name, model, s) for s in sentences]
+        with self._lock:
+            found = {}
+            for key in keys:
+                row = self._connection.execute('SELECT tree FROM trees WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    found[key] = row[0]
+            now = time.time()
+            self._connection.executemany('UPDATE trees SET last_used = ? WHERE key = ?',
+                                         [(now, key) for key in found])
+            self._connection.commit()
+            self.hits[parser_name] = self.hits.get(parser_name, 0) + len(found)
+            self.misses[parser_name] = self.misses.get(parser_name, 0) + len(keys) - len(found)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, parser_name: str, model: str, sentences: list, trees: list) -> None:
+        """
+        Stores the trees of several sentences, then evicts the least recently used entries if the cache is too big.
+
+        :param parser_name: name of the parser
+        :param model: identifier of the parser model
+        :param sentences: parsed sentences
+        :param trees: tree in bracketed notation for each sentence
+        :return: None
+        """
+        now = time.time()
+        rows = [(cache_key(parser_name, model, s), tree, len(tree.encode('utf-8')), now)
+                for s, tree in zip(sentences, trees)]
+        with self._lock:
+            for key, tree, size, last_used in rows:
+                # a replaced entry no longer counts with its old size
+                row = self._connection.execute('SELECT size FROM trees WHERE key = ?', (key,)).fetchone()
+                self._total_size += size - (row[0] if row is not None else 0)
+                self._connection.execute('INSERT OR REPLACE INTO trees VALUES (?, ?, ?, ?)',
+                                         (key, tree, size, last_used))
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        if self._total_size <= self.max_size:
+            return
+        evicted = []
+        for key, size in self._connection.execute('SELECT key, size FROM trees ORDER BY last_used'):
+            if self._total_size <= self.max_size:
+                break
+            evicted.append((key,))
+            self._total_size -= size
+        self._connection.executemany('DELETE FROM trees WHERE key = ?', evicted)
+
+    def cached(self, parser_name: str, model: str, parse_batch):
+        """
+        Wraps a batch parsing function so that only the cache misses reach the parser.
+
+        :param parser_name: name of the parser
+        :param model: identifier of the parser model
+        :param parse_batch: function mapping a list of sentences to a list of trees; an exception returned in place of a
+        tree, for a sentence the parser failed on, is passed on without being cached
+        :return: function with the same signature as parse_batch
+        """
+        def parse_batch_cached(batch: list) -> list:
+            trees = self.get_many(parser_name, model, batch)
+            missing = [i for i, tree in enumerate(trees) if tree is None]
+            if len(missing) > 0:
+                missing_sentences = [batch[i] for i in missing]
+                parsed = parse_batch(missing_sentences)
+                parses = [(s, tree) for s, tree in zip(missing_sentences, parsed) if isinstance(tree, str)]
+                self.put_many(parser_name, model, [s for s, tree in parses], [tree for s, tree in parses])
+                for i, tree in zip(missing, parsed):
+                    trees[i] = tree
+            return trees
+        return parse_batch_cached
+
+    def report(self) -> str:
+        """
+        Summarizes the hits and misses of this run.
+
+        :return: one line per parser
+        """
+        lines = []
+        for parser_name in sorted(set(self.hits) | set(self.misses)):
+            lines.append('{0}: {1} cache hits, {2} cache misses'.format(parser_name, self.hits.get(parser_name, 0),
+                                                                       self.misses.get(parser_name, 0)))
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
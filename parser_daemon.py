@@ -0,0 +1,141 @@
+"""
+A resident server that keeps the Berkeley, Stanford and AllenNLP parsers in memory and answers parse requests over
+HTTP on localhost, so that small jobs do not pay for loading the models and starting CoreNLP every time.
+create_trees.py sends its sentences here whenever the daemon is running.
+
+GET /health returns {"status": "ok", "parsers": [...]}.
+POST /parse with {"sentences": [...], "parsers": [...]} returns {"trees": {parser: [tree, ...]}}. The sentences are
+tokenized by the daemon unless the request also has "pretokenized": true, in which case their tokens must be separated
+by single spaces.
+POST /aggregate with {"sentences": [...]} parses the sentences with all three parsers and returns
+{"aggregates": [{"unweighted": tree, "weighted": tree}, ...]}, weighting the parsers with the weights given at start-up.
+A sentence whose trees cannot be aggregated gets {"error": message} instead. "pretokenized" works as for /parse.
+"""
+
+import argparse
+import contextlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import create_trees
+from aggregate import FOLDERS, aggregate_trees, load_weights
+
+
+class ParseRequestHandler(BaseHTTPRequestHandler):
+    # set by serve()
+    parsers = create_trees.PARSERS
+    locks = {}
+    weights = None
+
+    def send_json(self, status: int, body: dict) -> None:
+        """
+        Sends a JSON response.
+
+        :param status: HTTP status code
+        :param body: object to serialize
+        :return: None
+        """
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path != '/health':
+            self.send_json(404, {'error': 'unknown path ' + self.path})
+            return
+        self.send_json(200, {'status': 'ok', 'parsers': self.parsers})
+
+    def do_POST(self) -> None:
+        if self.path not in ('/parse', '/aggregate'):
+            self.send_json(404, {'error': 'unknown path ' + self.path})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            sentences = request['sentences']
+            parsers = request.get('parsers', self.parsers) if self.path == '/parse' else FOLDERS
+            pretokenized = request.get('pretokenized', False)
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {'error': 'expected a JSON object with a list of sentences'})
+            return
+        unknown = [name for name in parsers if name not in self.parsers]
+        if len(unknown) > 0:
+            self.send_json(400, {'error': 'parsers not served: ' + ', '.join(unknown)})
+            return
+
+        trees = {}
+        try:
+            if not pretokenized:
+                sentences = [create_trees.tokenize(s) for s in sentences]
+            for name in parsers:
+                with self.locks[name]:
+                    trees[name] = create_trees.PARSE_FUNCTIONS[name](sentences) if len(sentences) > 0 else []
+        except Exception as e:
+            self.send_json(500, {'error': repr(e)})
+            return
+        if self.path == '/parse':
+            self.send_json(200, {'trees': trees})
+            return
+
+        aggregates = []
+        for i, sentence in enumerate(sentences):
+            try:
+                unweighted, weighted = aggregate_trees({name: trees[name][i] for name in FOLDERS}, sentence,
+                                                       self.weights)
+                aggregates.append({'unweighted': unweighted, 'weighted': weighted})
+            except Exception as e:
+                aggregates.append({'error': repr(e)})
+        self.send_json(200, {'aggregates': aggregates})
+
+
+def serve(url: str, parsers: list, weights: list = None) -> None:
+    """
+    Loads the parsers and serves parse requests until interrupted.
+
+    :param url: address to listen on, which must be on localhost
+    :param parsers: names of the parsers to serve
+    :param weights: parser weights for aggregate requests; all parsers count the same by default
+    :return: None
+    """
+    address = urlparse(url)
+    ParseRequestHandler.parsers = parsers
+    ParseRequestHandler.weights = weights
+    # CoreNLP requests are spread over the server pool, while the local models parse one batch at a time
+    ParseRequestHandler.locks = {name: contextlib.nullcontext() if name == 'corenlp' else threading.Lock()
+                                 for name in parsers}
+    create_trees.get_model('tokenizer')
+    for name in parsers:
+        print('Loading ' + name)
+        create_trees.get_model(name)
+    # the AllenNLP parser takes its part-of-speech tags from the spaCy tagger, which would otherwise load on the first
+    # request
+    if 'allennlp' in parsers:
+        create_trees.get_model('tagger')
+    server = ThreadingHTTPServer((address.hostname, address.port), ParseRequestHandler)
+    print('Serving ' + ', '.join(parsers) + ' at ' + url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve parse requests from memory')
+    parser.add_argument('--url', type=str, default=create_trees.DAEMON_URL, help='The address to listen on')
+    parser.add_argument('--parsers', type=str, nargs='+', choices=create_trees.PARSERS, default=create_trees.PARSERS,
+                        help='The parsers to serve')
+    weight_group = parser.add_mutually_exclusive_group()
+    weight_group.add_argument('--weights', type=float, nargs=len(FOLDERS),
+                              help='The weights of the Berkeley, Stanford and AllenNLP parsers for aggregate requests')
+    weight_group.add_argument('--weights_from', type=str,
+                              help='A corpus whose parser weights, learned by medcpt.py, are used for aggregate requests')
+    create_trees.add_corenlp_arguments(parser)
+    args = parser.parse_args()
+    create_trees.configure_corenlp(args)
+    weights = load_weights(args.weights_from) if args.weights_from is not None else args.weights
+    serve(args.url, [name for name in create_trees.PARSERS if name in args.parsers], weights)
@@ -2,12 +2,8 @@ import pickle
 import re
 import os
 import argparse
-
-parser = argparse.ArgumentParser(description='Print and save parse trees in bracket notation')
-parser.add_argument('--test_sentences', type=str, help='The set of test sentences to input',
-                    choices=['basic_VPE', 'callhome_non_VPE', 'callhome_VPE', 'coraal', 'non_VPE', 'VPE_examples'],
-                    default='basic_VPE')
-args = parser.parse_args()
+from corpus import add_corpus_arguments, corpus_name
+from tree_store import TreeStore
 
 pos_tagset = ['CC', 'CD', 'DT', 'EX', 'FW', 'IN', 'JJ', 'JJR', 'JJS', 'LS', 'MD', 'NN', 'NNS', 'NNP', 'NNPS', 'PDT',
             'POS', 'PRP', 'PP$', 'RB', 'RBR', 'RBS', 'RP', 'SYM', 'TO', 'UH', 'VB', 'VBD', 'VBG', 'VBN', 'VBP', 'VBZ',
@@ -134,13 +130,13 @@ def get_sentence_cluster(cluster_list: list) -> int:
     """
     Finds the index of the cluster in the medcpt output corresponding to the whole sentence.
 
-    :param cluster_list: the list of clusters
+    :param cluster_list: the list of clusters as (start, end) intervals of character indices
     :return: the index found
     """
     max_length = 0
     index_max_length = 0
-    for i, cluster in enumerate(cluster_list):
-        length = len(cluster)
+    for i, (start, end) in enumerate(cluster_list):
+        length = end - start + 1
         if length > max_length:
             max_length = length
             index_max_length = i
@@ -161,20 +157,20 @@ def reorder(old_list: list, target_idx: int) -> list:
     return new_list
 
 
-def create_trees(sent: int, iteration: dict, sents: list) -> tuple:
+def create_trees(sent: int, iteration: dict, sentence: str) -> tuple:
     """
     Converts the output of CPTAM into trees.
 
     :param sent: sentence number
     :param iteration: dictionary output of the last iteration of medcpt
-    :param sents: list of sentences as strings
+    :param sentence: the sentence as a string
     :return: tuple of trees in bracketed notation; the first one is with unweighted input parsers, and the second one with weighted input parsers
     """
     clusters = iteration[sent]['medcpt_clusters']
     pos_agg = iteration[sent]['mv_pos_aggregation']
     weighted_pos_agg = iteration[sent]['weight_pos_aggregation']
 
-    full_sent_str = sents[sent - 1].replace(' ', '')
+    full_sent_str = sentence.replace(' ', '')
     char_dict = {}
     for k, c in enumerate(full_sent_str):
         key = str(k + 1)
@@ -188,8 +184,8 @@ def create_trees(sent: int, iteration: dict, sents: list) -> tuple:
 
     full_sent_list = []
     weighted_full_sent_list = []
-    for i, cluster in enumerate(clusters):
-        indices = re.split(r'[ _]', cluster)[:-1]
+    for i, (start, end) in enumerate(clusters):
+        indices = [str(k) for k in range(start, end + 1)]
         if i == 0:
             full_sent_list = initialize(pos_agg[0], indices)
             weighted_full_sent_list = initialize(weighted_pos_agg[0], indices)
@@ -219,35 +215,40 @@ def save_to_file(t: str, num: int, fold: str) -> None:
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print and save parse trees in bracket notation')
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    name = corpus_name(args.test_sentences, args.name)
+
     # retrieve output of medcpt.py
     # this code adapted from Kulkarni et al. (2022)
     pickle_dump_directory = "dictionary_pickle_files/"
     dataset_directory = "dataset/"
-    print("Dataset: " + args.test_sentences)
-    pickle_directory = os.path.join(pickle_dump_directory, args.test_sentences)
+    print("Dataset: " + name)
+    pickle_directory = os.path.join(pickle_dump_directory, name)
     medcpt_directory = os.path.join(pickle_directory, 'medcpt')
     with open(os.path.join(medcpt_directory, 'medcpt_aggregate_clusters_dictionary_log.pickle'), 'rb') as handle:
         medcpt_aggregate_clusters_dictionary = pickle.load(handle)
 
-    num_iterations = len(medcpt_aggregate_clusters_dictionary)
-    final_iteration = medcpt_aggregate_clusters_dictionary[num_iterations]
-
-    # retrieve sentences
-    sentences = []
-    with open(os.path.join('test_sentences', args.test_sentences)) as source_file:
-        for line in source_file:
-            split = line.split(':')
-            text = split[1].strip()
-            sentences.append(text)
-
-    # print and save trees
-    for idx, sentence in enumerate(final_iteration):
-        if isinstance(sentence, int):
-            tree, weighted_tree = create_trees(sentence, final_iteration, sentences)
+    final_iteration = medcpt_aggregate_clusters_dictionary[medcpt_aggregate_clusters_dictionary['iterations']]
+
+    # look up the sentences in the manifest of the corpus
+    store = TreeStore(os.path.join(dataset_directory, name), read_only=True)
+
+    # print and save trees as the sentences are read
+    for sentence, entry, text in store.input_sentences(args.test_sentences):
+        if not store.matches_input(sentence, text):
+            print('Skipping sentence ' + str(sentence) + ', which has changed since it was parsed')
+        elif sentence in final_iteration and (final_iteration[sentence]['error'] or
+                                              len(final_iteration[sentence]['medcpt_clusters']) == 0):
+            # e.g. a parser failed on the sentence, so its trees could not be aggregated
+            print('Skipping sentence ' + str(sentence) + ', which could not be aggregated')
+        elif sentence in final_iteration:
+            tree, weighted_tree = create_trees(sentence, final_iteration, text)
             print(sentence)
             print(tree)
             if tree != weighted_tree:
                 print('With weighted parsers:')
                 print(weighted_tree)
-                save_to_file(weighted_tree, idx + 1, os.path.join('weighted', args.test_sentences))
-            save_to_file(tree, idx + 1, os.path.join('unweighted', args.test_sentences))
+                save_to_file(weighted_tree, sentence, os.path.join('weighted', name))
+            save_to_file(tree, sentence, os.path.join('unweighted', name))
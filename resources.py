@@ -5,21 +5,23 @@ My changes:
 - changed the values of some variables to match the directory structure
 - simplified the reading of files in dictionary_creation()
 - added argparse
+- accepted any corpus name and fixed the pickle paths to match medcpt.py
+- read the trees from the packed tree store
+- matched the brackets in get_clusters() with a stack in a single pass
+- made format_parsed_sentence() a deterministic single pass that keeps the original labels and characters
+- stored each cluster span as a (start, end) interval of character indices instead of a string
+- indexed and clustered the sentences of all parsers on a process pool with --workers
+- wrote each pickle once, with checksums instead of reloading them when --verify is given
 """
 
 import re
-import pickle
+import bisect
 import os
-import random
-import string
 import argparse
-letters = string.ascii_lowercase
-
-parser = argparse.ArgumentParser(description='Process parse trees')
-parser.add_argument('--test_sentences', type=str, help='The set of test sentences to input',
-                    choices=['basic_VPE', 'callhome_non_VPE', 'callhome_VPE', 'coraal', 'non_VPE', 'VPE_examples'],
-                    default='basic_VPE')
-args = parser.parse_args()
+from concurrent.futures import ProcessPoolExecutor
+from artifacts import save_pickle
+from corpus import add_corpus_arguments, corpus_name
+from tree_store import TreeStore
 
 
 class clusters_from_parsed_sentence:
@@ -28,72 +30,61 @@ class clusters_from_parsed_sentence:
         self.language = language
         self.character_array = [char for char in self.parsed_sentence]
     def get_clusters(self):
-        brackets_array = []
-        brackets_index_array = []
-        for i in range(0, len(self.character_array)):
-            if self.character_array[i] in ['(', ')']:
-                brackets_array.append(self.character_array[i])
-                brackets_index_array.append(i)
-
+        # match the brackets with a stack, keeping the clusters in the order of their opening brackets
         cluster_bracket_index = []
-        current_length_bracket_array = len(brackets_array)
-        previous_length_bracket_array = 0
-        while len(brackets_array) > 0:
-            previous_length_bracket_array = current_length_bracket_array
-            for i in range(0, len(brackets_array) - 1):
-                if brackets_array[i] == '(' and brackets_array[i + 1] == ')':
-                    cluster_bracket = []
-                    cluster_bracket.append(brackets_index_array[i])
-                    cluster_bracket.append(brackets_index_array[i + 1])
-                    cluster_bracket_index.append(cluster_bracket)
-                    brackets_array.pop(i)
-                    brackets_array.pop(i)
-                    brackets_index_array.pop(i)
-                    brackets_index_array.pop(i)
-                    break
-                else:
-                    continue
-            current_length_bracket_array = len(brackets_array)
-            if previous_length_bracket_array == current_length_bracket_array:
-                if len(brackets_array) > 0:
+        open_clusters = []
+        for i, char in enumerate(self.parsed_sentence):
+            if char == '(':
+                open_clusters.append(len(cluster_bracket_index))
+                cluster_bracket_index.append([i, None])
+            elif char == ')':
+                if len(open_clusters) == 0:
                     raise Exception("Invalid number of brackets")
-                break
-        start_index = []
-        end_index = []
-        counter_index = []
-
-        for i in range(0, len(cluster_bracket_index)):
-            counter_index.append(i)
-            start_index.append(cluster_bracket_index[i][0])
-            end_index.append(cluster_bracket_index[i][1])
-
-        start_index_sorted = [index for index, counter in sorted(zip(start_index, counter_index))]
-        counter_index_sorted = [counter for index, counter in sorted(zip(start_index, counter_index))]
-        cluster_bracket_index_sorted = []
-        for i in range(0, len(counter_index_sorted)):
-            cluster_bracket_index_sorted.append(cluster_bracket_index[counter_index_sorted[i]])
+                cluster_bracket_index[open_clusters.pop()][1] = i
+        if len(open_clusters) > 0:
+            raise Exception("Invalid number of brackets")
+
+        # the words of the whole sentence, so that the tokens of each cluster are not found again from its text
+        word_starts = []
+        word_ends = []
+        word_of_character = []
+        leaf_words = []
+        leaf_tokens = []
+        position = 0
+        for w, word in enumerate(self.parsed_sentence.split(' ')):
+            word_starts.append(position)
+            word_ends.append(position + len(word))
+            word_of_character.extend([w] * (len(word) + 1))
+            if ')' in word:
+                leaf_words.append(w)
+                leaf_tokens.append(word.replace(')', ''))
+            position += len(word) + 1
 
         self.character_clusters = []
         self.cluster_pos = []
-
-        for i in range(0, len(cluster_bracket_index_sorted)):
-            clusters = []
-            for j in range(cluster_bracket_index_sorted[i][0], cluster_bracket_index_sorted[i][1] + 1):
-                clusters.append(self.character_array[j])
-            pos = []
-            for k in range(1, len(clusters)):
-                if clusters[k] != ' ':
-                    pos.append(clusters[k])
-                elif clusters[k] == ' ':
-                    break
-            self.cluster_pos.append(''.join(pos))
-            self.character_clusters.append(''.join(clusters))
-
         self.cluster_span = []
-        for i in range(0, len(self.character_clusters)):
-            character_indexing_object = character_indexing(self.character_clusters[i], self.language)
-            tokens = character_indexing_object.get_tokens(self.character_clusters[i])
-            self.cluster_span.append(' '.join(tokens))
+
+        for start, end in cluster_bracket_index:
+            cluster = self.parsed_sentence[start:end + 1]
+            self.cluster_pos.append(cluster[1:].split(' ', 1)[0])
+            self.character_clusters.append(cluster)
+
+            # the first and last words of a cluster can be cut off by its brackets
+            first_word = word_of_character[start]
+            last_word = word_of_character[end]
+            if first_word == last_word:
+                tokens = [cluster.replace(')', '')]
+            else:
+                tokens = []
+                first = self.parsed_sentence[start:word_ends[first_word]]
+                if ')' in first:
+                    tokens.append(first.replace(')', ''))
+                tokens.extend(leaf_tokens[bisect.bisect_right(leaf_words, first_word):
+                                          bisect.bisect_left(leaf_words, last_word)])
+                tokens.append(self.parsed_sentence[word_starts[last_word]:end + 1].replace(')', ''))
+            # the span is kept as the interval of the indices of its first and last characters
+            indices = re.findall(r'\d+', ' '.join(tokens))
+            self.cluster_span.append((int(indices[0]), int(indices[-1])))
 
         return self.character_clusters, self.cluster_span, self.cluster_pos
 
@@ -123,74 +114,73 @@ class character_indexing:
             self.pos[i] = self.pos[i].replace('(', '')
         return self.pos
     def format_parsed_sentence(self, parsed_sentence):
-        parsed_sentence_backup = parsed_sentence
-        formatted_characters = [char for char in parsed_sentence]
-        numbers = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', '`', '\'', '!', '@', '#', '$', '%', '^', '&', '*', '[', ']', '-', '_', '+', '=', ';', ':', '>', '<', '|', '/', '¿½', '¿', '½', '°']
-        for i in range (0, len(formatted_characters)):
-            if formatted_characters[i] in numbers:
-                formatted_characters[i] = random.choice(letters)
-        parsed_sentence = ''.join(formatted_characters)
-        tokens = self.get_tokens(parsed_sentence=parsed_sentence)
-        pos = self.get_pos(parsed_sentence=parsed_sentence)
-        for i in range(0, len(pos)):
-            parsed_sentence = parsed_sentence.replace('(' + pos[i], '(', 1)
-        sentence_without_space = ''.join(tokens)
-        characters = [char for char in sentence_without_space]
+        # a single pass over the words: labels are kept and each character of a leaf is replaced by its index
+        formatted_words = []
+        characters = []
+        for word in str(parsed_sentence).split(' '):
+            if '(' in word or ')' not in word:
+                formatted_words.append(word)
+                continue
+            formatted_word = []
+            for char in word:
+                if char == ')':
+                    formatted_word.append(char)
+                else:
+                    characters.append(char)
+                    formatted_word.append(str(len(characters)) + '_')
+            formatted_words.append(''.join(formatted_word))
         self.characters = characters
-        character_index = []
-        for i in range(0, len(characters)):
-            character_index.append(i + 1)
-        self.character_index = character_index
-        formatted_characters = [char for char in parsed_sentence]
-        covered = 0
-        for i in range(0, len(formatted_characters)):
-            for j in range(covered, len(characters)):
-                if characters[j] == formatted_characters[i]:
-                    formatted_characters[i] = str(character_index[j]) + '_'
-                    covered = j + 1
-                    break
-
-        parsed_sentence = ''.join(formatted_characters)
-        formatted_tokens = parsed_sentence.split(' ')
-        covered = 0
-        for i in range(0, len(formatted_tokens)):
-            if formatted_tokens[i] == '(':
-                formatted_tokens[i] = formatted_tokens[i] + str(pos[covered])
-                covered = covered + 1
-        parsed_sentence = ' '.join(formatted_tokens)
-        self.formatted_parsed_sentence = parsed_sentence
+        self.character_index = list(range(1, len(characters) + 1))
+        self.formatted_parsed_sentence = ' '.join(formatted_words)
 
         return self.formatted_parsed_sentence, self.characters, self.character_index
 
 
-def dictionary_creation():
+def index_parsed_sentence(parsed_sentence):
+    # character indexing and clustering of one tree, which runs in the worker processes; None marks an error
+    try:
+        if parsed_sentence == '':
+            raise ValueError('No tree')
+        character_indexing_object = character_indexing(parsed_sentence=parsed_sentence, language='English')
+        formatted_parsed_sentence, characters, character_index = character_indexing_object.format_parsed_sentence(
+            parsed_sentence=parsed_sentence)
+        clusters_from_parsed_sentence_object = clusters_from_parsed_sentence(
+            parsed_sentence=formatted_parsed_sentence, language='English')
+        character_clusters, cluster_span, cluster_pos = clusters_from_parsed_sentence_object.get_clusters()
+        return formatted_parsed_sentence, characters, character_index, character_clusters, cluster_span, cluster_pos
+    except:
+        return None
+
+
+def dictionary_creation(input_directory, workers=1, verify=False):
     pickle_dump_directory = "dictionary_pickle_files"
     dataset_directory = "dataset"
     folders = ["berkeley", "corenlp", "allennlp"]
-    directory = os.path.join(dataset_directory, args.test_sentences)
+    store = TreeStore(os.path.join(dataset_directory, input_directory), read_only=True)
+    sentence_ids = store.ids()
+    parsed_sentences = {folder: [store.get_tree(k, folder).rstrip() for k in sentence_ids] for folder in folders}
+    store.close()
+
+    # the sentences of all parsers are sharded over the worker processes at once, and the results come back in order
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        chunksize = max(1, len(sentence_ids) // (workers * 4))
+        entries = {folder: executor.map(index_parsed_sentence, parsed_sentences[folder], chunksize=chunksize)
+                   for folder in folders}
+    else:
+        entries = {folder: map(index_parsed_sentence, parsed_sentences[folder]) for folder in folders}
 
     for folder in folders:
-        path = os.path.join(directory, folder)
         sentence_dictionary = {}
         sentence_cluster_dictionary = {}
         parser_input_dictionary = {}
-        for j, filename in enumerate(os.listdir(path)):
-            k = j + 1
-            file = os.path.join(path, filename)
-
-            read_file = open(file, 'r')
-            read_line = read_file.readline()
-
-            parsed_sentence = read_line.rstrip()
+        for k, parsed_sentence, indexed in zip(sentence_ids, parsed_sentences[folder], entries[folder]):
             parser_input_dictionary[k] = {}
             parser_input_dictionary[k]['parsed_input_sentence'] = parsed_sentence
-            try:
-                character_indexing_object = character_indexing(parsed_sentence=parsed_sentence, language='English')
-                formatted_parsed_sentence, characters, character_index = character_indexing_object.format_parsed_sentence(
-                    parsed_sentence=parsed_sentence)
-                clusters_from_parsed_sentence_object = clusters_from_parsed_sentence(
-                    parsed_sentence=formatted_parsed_sentence, language='English')
-                character_clusters, cluster_span, cluster_pos = clusters_from_parsed_sentence_object.get_clusters()
+            if indexed is not None:
+                (formatted_parsed_sentence, characters, character_index, character_clusters, cluster_span,
+                 cluster_pos) = indexed
                 sentence_dictionary[k] = {}
                 sentence_dictionary[k]['parsed_sentence'] = parsed_sentence
                 sentence_dictionary[k]['formatted_parsed_sentence'] = formatted_parsed_sentence
@@ -204,7 +194,7 @@ def dictionary_creation():
                 sentence_cluster_dictionary[k]['cluster_span'] = cluster_span
                 sentence_cluster_dictionary[k]['cluster_pos'] = cluster_pos
                 sentence_cluster_dictionary[k]['error'] = False
-            except:
+            else:
                 sentence_dictionary[k] = {}
                 sentence_dictionary[k]['parsed_sentence'] = ''
                 sentence_dictionary[k]['formatted_parsed_sentence'] = ''
@@ -219,36 +209,25 @@ def dictionary_creation():
                 sentence_cluster_dictionary[k]['cluster_pos'] = []
                 sentence_cluster_dictionary[k]['error'] = True
 
-        pickle_directory = os.path.join(pickle_dump_directory, folder)
-        if not os.path.exists(pickle_dump_directory):
-            os.mkdir(pickle_dump_directory)
-        if not os.path.exists(pickle_directory):
-            os.mkdir(pickle_directory)
-        pickle_path = str(pickle_directory) + folder + '/'
+        pickle_path = os.path.join(pickle_dump_directory, input_directory, folder)
         if not os.path.exists(pickle_path):
-            os.mkdir(pickle_path)
-        with open(str(pickle_path) + '/sentence_dictionary.pickle', 'wb') as handle:
-            pickle.dump(sentence_dictionary, handle, protocol=pickle.HIGHEST_PROTOCOL)
-        with open(str(pickle_path) + '/sentence_cluster_dictionary.pickle', 'wb') as handle:
-            pickle.dump(sentence_cluster_dictionary, handle, protocol=pickle.HIGHEST_PROTOCOL)
-
-        with open(str(pickle_path) + '/parser_input_dictionary.pickle', 'wb') as handle:
-            pickle.dump(parser_input_dictionary, handle, protocol=pickle.HIGHEST_PROTOCOL)
-
-        with open(str(pickle_path) + '/sentence_dictionary.pickle', 'rb') as handle:
-            sentence_dictionary_pickle = pickle.load(handle)
-
-        with open(str(pickle_path) + '/sentence_cluster_dictionary.pickle', 'rb') as handle:
-            sentence_cluster_dictionary_pickle = pickle.load(handle)
-
-        with open(str(pickle_path) + '/parser_input_dictionary.pickle', 'rb') as handle:
-            parser_input_dictionary_pickle = pickle.load(handle)
-
-        print(sentence_dictionary_pickle == sentence_dictionary)
-        print(sentence_cluster_dictionary_pickle == sentence_cluster_dictionary)
-        print(parser_input_dictionary_pickle == parser_input_dictionary)
+            os.makedirs(pickle_path)
+        save_pickle(sentence_dictionary, os.path.join(pickle_path, 'sentence_dictionary.pickle'), verify)
+        save_pickle(sentence_cluster_dictionary, os.path.join(pickle_path, 'sentence_cluster_dictionary.pickle'),
+                    verify)
+        save_pickle(parser_input_dictionary, os.path.join(pickle_path, 'parser_input_dictionary.pickle'), verify)
+    if executor is not None:
+        executor.shutdown()
     return True
 
 
 if __name__ == '__main__':
-    run = dictionary_creation()
+    parser = argparse.ArgumentParser(description='Process parse trees')
+    add_corpus_arguments(parser)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='The number of processes that index and cluster the sentences')
+    parser.add_argument('--verify', action='store_true',
+                        help='Record the checksum of each pickle and confirm that it was written correctly')
+    args = parser.parse_args()
+
+    run = dictionary_creation(corpus_name(args.test_sentences, args.name), args.workers, args.verify)
@@ -1,7 +1,23 @@
 #!/usr/bin/env bash
+# usage: bash run_all.sh TEST_SENTENCES [--name NAME] [create_trees.py options]
+# --name is passed on to every script, so that they all use the same corpus; any other arguments after the set of test
+# sentences are passed on to create_trees.py only. A script that fails stops the pipeline.
+set -e
 
-python create_trees.py --test_sentences $1
-python resources.py --test_sentences $1
-python medcpt.py --test_sentences $1
-python print_trees.py --test_sentences $1
-python to_latex.py --test_sentences $1
+test_sentences=$1
+shift
+name=()
+create_trees_options=()
+while [ $# -gt 0 ]; do
+    case $1 in
+        --name) name=(--name "$2"); shift 2 ;;
+        --name=*) name=("$1"); shift ;;
+        *) create_trees_options+=("$1"); shift ;;
+    esac
+done
+
+python create_trees.py --test_sentences "$test_sentences" "${name[@]}" "${create_trees_options[@]}"
+python resources.py --test_sentences "$test_sentences" "${name[@]}"
+python medcpt.py --test_sentences "$test_sentences" "${name[@]}"
+python print_trees.py --test_sentences "$test_sentences" "${name[@]}"
+python to_latex.py --test_sentences "$test_sentences" "${name[@]}"
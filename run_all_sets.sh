@@ -0,0 +1,37 @@
+#!/usr/bin/env bash
+# Runs all the scripts on every set of test sentences with one CoreNLP server that stays warm for all of them.
+# CORENLP_HOME, CORENLP_PORT, CORENLP_MEMORY and CORENLP_THREADS configure the server, and CORENLP_TIMEOUT is how many
+# seconds to wait for it to start.
+
+CORENLP_HOME=${CORENLP_HOME:-~/stanza_corenlp}
+CORENLP_PORT=${CORENLP_PORT:-9000}
+CORENLP_MEMORY=${CORENLP_MEMORY:-8G}
+CORENLP_THREADS=${CORENLP_THREADS:-5}
+CORENLP_TIMEOUT=${CORENLP_TIMEOUT:-120}
+
+if [ ! -d "$CORENLP_HOME" ]; then
+    python -c "import stanza; stanza.install_corenlp()"
+fi
+
+java -Xmx$CORENLP_MEMORY -cp "$CORENLP_HOME/*" edu.stanford.nlp.pipeline.StanfordCoreNLPServer \
+    -port $CORENLP_PORT -threads $CORENLP_THREADS -quiet &
+SERVER=$!
+trap "kill $SERVER 2> /dev/null" EXIT
+waited=0
+until curl -s http://localhost:$CORENLP_PORT/ready > /dev/null; do
+    # the server exits at once if java is missing or the port is taken
+    if ! kill -0 $SERVER 2> /dev/null; then
+        echo "The CoreNLP server failed to start" >&2
+        exit 1
+    fi
+    if [ $waited -ge $CORENLP_TIMEOUT ]; then
+        echo "The CoreNLP server was not ready after $CORENLP_TIMEOUT seconds" >&2
+        exit 1
+    fi
+    sleep 1
+    waited=$((waited + 1))
+done
+
+for test_sentences in basic_VPE callhome_non_VPE callhome_VPE coraal non_VPE VPE_examples; do
+    bash run_all.sh $test_sentences --corenlp_url http://localhost:$CORENLP_PORT "$@"
+done
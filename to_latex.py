@@ -5,17 +5,16 @@ My changes:
 - added extra parsers to main()
 - changed the file input structure
 - added argparse
+- accepted any file of sentences
+- read the parser trees from the packed tree store
+- skipped sentences that have changed since they were parsed
 """
 
 import re
 import os
 import argparse
-
-parser = argparse.ArgumentParser(description='Output trees to LaTeX')
-parser.add_argument('--test_sentences', type=str, help='The set of test sentences to input',
-                    choices=['basic_VPE', 'callhome_non_VPE', 'callhome_VPE', 'coraal', 'non_VPE', 'VPE_examples'],
-                    default='basic_VPE')
-args = parser.parse_args()
+from corpus import add_corpus_arguments, corpus_name
+from tree_store import TreeStore
 
 
 head = """\\documentclass[landscape, 12pt]{article} 
@@ -43,18 +42,16 @@ tail = """\\end{enumerate}
 \\end{document}"""
 
 
-def get_tree(num: int, path: str, parser: str) -> str:
+def get_tree(num: int, store: TreeStore, parser: str) -> str:
     """
     Retrieves a stored tree that was outputted by a parser.
 
     :param num: sentence number
-    :param path: path to the folder containing the trees
+    :param store: tree store of the corpus
     :param parser: name of the parser
     :return: tree in bracketed notation
     """
-    with open(os.path.join(path, parser, 'sentence_' + str(num) + '.txt')) as file:
-        output = file.readline()
-    return output
+    return store.get_tree(num, parser)
 
 
 def get_cptam(num: int, directory: str) -> str:
@@ -88,42 +85,44 @@ def texify_tree(s):
         s_parse_tree)
 
 
-def main():
-    input_path = os.path.join('test_sentences', args.test_sentences)
-    tree_path = os.path.join('dataset', args.test_sentences)
-    out = open(args.test_sentences + '.tex', 'w')
+def main(source: str, name: str) -> None:
+    store = TreeStore(os.path.join('dataset', name), read_only=True)
+    out = open(name + '.tex', 'w')
     out.write(head)
-    with open(input_path) as f:
-        for idx, line in enumerate(f):
-            # This script takes a plain text file
-            # with lines of the format <entry name>:<sentence>
-            temp = line.split(':')
-            index = temp[0]
-            text = temp[1]
-            out.write("\n\n \\begin{samepage}")
-            out.write("\n\n \\item  \\verb|{0}|  \n\n".format(index))
-            out.write("\n\n {{\\it {0} }} \n\n".format(text.rstrip()))
-            s_final = texify_tree(get_tree(idx + 1, tree_path, 'corenlp'))
-            b_final = texify_tree(get_tree(idx + 1, tree_path, 'berkeley'))
-            a_final = texify_tree(get_tree(idx + 1, tree_path, 'allennlp'))
-            c_final = texify_tree(get_cptam(idx + 1, os.path.join('unweighted', args.test_sentences)))
-            c2 = get_cptam(idx + 1, os.path.join('weighted', args.test_sentences))
-            out.write("\\begin{itemize} \n\n \\item {\\bf Stanford Parser (CoreNLP):} \n\n ")
-            out.write(s_final)
-            out.write("\n\n \\item {\\bf Berkeley Parser: } \n\n")
-            out.write(b_final)
-            out.write("\n\n \\item {\\bf AllenNLP Parser: } \n\n")
-            out.write(a_final)
-            out.write("\n\n \\item {\\bf CPTAM Parse Aggregation: } \n\n")
-            out.write(c_final)
-            if c2 != '':
-                c2_final = texify_tree(c2)
-                out.write("\n\n \\item {\\bf CPTAM Parse Aggregation (weighted): } \n\n")
-                out.write(c2_final)
-            out.write("\\end{itemize}")
-            out.write("\n\n \\end{samepage}")
+    # This script takes a plain text file
+    # with lines of the format <entry name>:<sentence>
+    for num, index, text in store.input_sentences(source):
+        if not store.matches_input(num, text):
+            print('Skipping sentence ' + str(num) + ', which has changed since it was parsed')
+            continue
+        out.write("\n\n \\begin{samepage}")
+        out.write("\n\n \\item  \\verb|{0}|  \n\n".format(index))
+        out.write("\n\n {{\\it {0} }} \n\n".format(text.rstrip()))
+        s_final = texify_tree(get_tree(num, store, 'corenlp'))
+        b_final = texify_tree(get_tree(num, store, 'berkeley'))
+        a_final = texify_tree(get_tree(num, store, 'allennlp'))
+        c_final = texify_tree(get_cptam(num, os.path.join('unweighted', name)))
+        c2 = get_cptam(num, os.path.join('weighted', name))
+        out.write("\\begin{itemize} \n\n \\item {\\bf Stanford Parser (CoreNLP):} \n\n ")
+        out.write(s_final)
+        out.write("\n\n \\item {\\bf Berkeley Parser: } \n\n")
+        out.write(b_final)
+        out.write("\n\n \\item {\\bf AllenNLP Parser: } \n\n")
+        out.write(a_final)
+        out.write("\n\n \\item {\\bf CPTAM Parse Aggregation: } \n\n")
+        out.write(c_final)
+        if c2 != '':
+            c2_final = texify_tree(c2)
+            out.write("\n\n \\item {\\bf CPTAM Parse Aggregation (weighted): } \n\n")
+            out.write(c2_final)
+        out.write("\\end{itemize}")
+        out.write("\n\n \\end{samepage}")
     out.write(tail)
+    store.close()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Output trees to LaTeX')
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    main(args.test_sentences, corpus_name(args.test_sentences, args.name))
@@ -0,0 +1,254 @@
+"""
+A packed, append-only store of the parse trees of a corpus, replacing the one file per sentence per parser layout.
+The trees are kept in dataset/<corpus>/trees.jsonl with one record per sentence and parser. A later record for the
+same sentence and parser replaces an earlier one.
+dataset/<corpus>/manifest.json is the sentence manifest of the corpus: it maps each sentence number to the line and
+entry name of the sentence in the input, the hash and text of the input sentence, and the byte offset of the record of
+each parser for random access along with the hash of the sentence that parser was given. The later scripts look sentences up in it instead of scanning directories, and take the
+sentences from it when the input was read from stdin, which cannot be read a second time.
+"""
+
+import json
+import os
+from corpus import read_sentences, sentence_hash
+
+STORE_FILE = 'trees.jsonl'
+MANIFEST_FILE = 'manifest.json'
+# fields of a record that describe the input sentence rather than the tree
+SENTENCE_FIELDS = ('line', 'entry', 'hash', 'text')
+
+
+class TreeStore:
+    def __init__(self, directory: str, read_only: bool = False):
+        """
+        Opens the store of a corpus, creating it if needed.
+
+        :param directory: folder of the corpus, e.g. dataset/basic_VPE
+        :param read_only: whether to open an existing store without ever writing to it, as the scripts after
+        create_trees.py do; a corpus that has not been parsed then raises FileNotFoundError instead of being created
+        """
+        self.path = os.path.join(directory, STORE_FILE)
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.read_only = read_only
+        if read_only and not os.path.exists(self.path):
+            raise FileNotFoundError('No parse trees in ' + directory + '; run create_trees.py on the corpus first')
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._writer = None
+        self._reader = None
+        self._superseded = 0
+        self.offsets = {}
+        self.hashes = {}
+        self.sentences = {}
+        self._load_manifest()
+
+    def _load_manifest(self) -> None:
+        """
+        Loads the sentence manifest, rebuilding it from the store if it is missing or out of date.
+
+        :return: None
+        """
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            # manifests without the hashes of each parser are rebuilt
+            if manifest['size'] == size and all('hashes' in info for info in manifest['sentences'].values()):
+                self._superseded = manifest['superseded']
+                for sentence, info in manifest['sentences'].items():
+                    self.offsets[int(sentence)] = info.pop('offsets')
+                    self.hashes[int(sentence)] = info.pop('hashes')
+                    self.sentences[int(sentence)] = info
+                return
+
+        good_size = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                # a record cut off by a crash is dropped
+                if not line.endswith(b'\n'):
+                    break
+                record = json.loads(line)
+                self._add(record, good_size)
+                good_size += len(line)
+        if good_size != size and not self.read_only:
+            with open(self.path, 'ab') as f:
+                f.truncate(good_size)
+
+    def _add(self, record: dict, offset: int) -> None:
+        parsers = self.offsets.setdefault(record['id'], {})
+        if record['parser'] in parsers:
+            self._superseded += 1
+        parsers[record['parser']] = offset
+        self.hashes.setdefault(record['id'], {})[record['parser']] = record.get('hash')
+        info = {field: record[field] for field in SENTENCE_FIELDS if field in record}
+        if len(info) > 0:
+            self.sentences.setdefault(record['id'], {}).update(info)
+
+    def append(self, sentence: int, parser_name: str, tree: str, **fields) -> None:
+        """
+        Adds the tree of a sentence to the store.
+
+        :param sentence: sentence number
+        :param parser_name: name of the parser
+        :param tree: tree in bracketed notation
+        :param fields: further values to keep in the record; line, entry, hash and text describe the input sentence
+        and go into the manifest
+        :return: None
+        """
+        if self.read_only:
+            raise ValueError('The tree store ' + self.path + ' is open read-only')
+        if self._writer is None:
+            self._writer = open(self.path, 'ab')
+        record = {'id': sentence, 'parser': parser_name, 'tree': tree}
+        record.update(fields)
+        self._add(record, self._writer.tell())
+        self._writer.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+
+    def flush(self) -> None:
+        """
+        Writes the records appended so far to disk.
+
+        :return: None
+        """
+        if self._writer is not None:
+            self._writer.flush()
+
+    def get_record(self, sentence: int, parser_name: str) -> dict:
+        """
+        Reads the record of a sentence and parser.
+
+        :param sentence: sentence number
+        :param parser_name: name of the parser
+        :return: the record, or None if there is none
+        """
+        offset = self.offsets.get(sentence, {}).get(parser_name)
+        if offset is None:
+            return None
+        if self._writer is not None:
+            self._writer.flush()
+        if self._reader is None:
+            self._reader = open(self.path, 'rb')
+        self._reader.seek(offset)
+        return json.loads(self._reader.readline())
+
+    def get_tree(self, sentence: int, parser_name: str) -> str:
+        """
+        Reads the tree of a sentence produced by a parser.
+
+        :param sentence: sentence number
+        :param parser_name: name of the parser
+        :return: tree in bracketed notation, or the empty string if there is none
+        """
+        record = self.get_record(sentence, parser_name)
+        return '' if record is None else record['tree']
+
+    def get(self, sentence: int) -> dict:
+        """
+        Reads the trees of a sentence produced by all parsers.
+
+        :param sentence: sentence number
+        :return: dictionary mapping parser name to tree in bracketed notation
+        """
+        return {parser_name: self.get_tree(sentence, parser_name) for parser_name in self.offsets.get(sentence, {})}
+
+    def sentence_info(self, sentence: int) -> dict:
+        """
+        Looks up where a sentence came from in the input.
+
+        :param sentence: sentence number
+        :return: dictionary with the line number, entry name, hash and text of the input sentence, as far as they are
+        known
+        """
+        return self.sentences.get(sentence, {})
+
+    def matches_input(self, sentence: int, text: str, parser_name: str = None) -> bool:
+        """
+        Checks that the trees of a sentence were parsed from the given input sentence. The parsers are checked one by
+        one, since a sentence that changed may have been parsed again by only some of them.
+
+        :param sentence: sentence number
+        :param text: input sentence
+        :param parser_name: only check the tree of this parser; the trees of all parsers are checked by default
+        :return: False if the hash of the sentence when a tree was parsed is known and differs, True otherwise
+        """
+        text_hash = sentence_hash(text)
+        hashes = self.hashes.get(sentence, {})
+        parser_names = hashes if parser_name is None else [parser_name]
+        return all(hashes.get(name) in (None, text_hash) for name in parser_names)
+
+    def input_sentences(self, source: str):
+        """
+        Reads the input sentences of the corpus for the scripts after create_trees.py. Sentences from a file are read
+        again, so that changes since they were parsed can be detected; sentences from stdin are taken from the manifest.
+
+        :param source: name of a set of test sentences, path to a file, or - for stdin
+        :return: generator of (sentence number, entry name, sentence) tuples
+        """
+        if source != '-':
+            yield from read_sentences(source)
+            return
+        for sentence in self.ids():
+            info = self.sentence_info(sentence)
+            if 'text' in info:
+                yield sentence, info['entry'], info['text']
+
+    def ids(self) -> list:
+        """
+        Lists the sentences in the store.
+
+        :return: sorted sentence numbers
+        """
+        return sorted(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def compact(self) -> None:
+        """
+        Rewrites the store without the records that have been replaced by later ones.
+
+        :return: None
+        """
+        if self._superseded == 0 or self.read_only:
+            return
+        temporary_path = self.path + '.tmp'
+        offsets = {}
+        with open(temporary_path, 'wb') as f:
+            for sentence in self.ids():
+                offsets[sentence] = {}
+                for parser_name in self.offsets[sentence]:
+                    offsets[sentence][parser_name] = f.tell()
+                    record = self.get_record(sentence, parser_name)
+                    f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        self._close_files()
+        os.replace(temporary_path, self.path)
+        self.offsets = offsets
+        self._superseded = 0
+
+    def _close_files(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def close(self) -> None:
+        """
+        Flushes the store and writes its sentence manifest, unless it is open read-only.
+
+        :return: None
+        """
+        self._close_files()
+        if self.read_only or not os.path.exists(self.path):
+            return
+        sentences = {}
+        for sentence in self.ids():
+            sentences[sentence] = dict(self.sentence_info(sentence))
+            sentences[sentence]['offsets'] = self.offsets[sentence]
+            sentences[sentence]['hashes'] = self.hashes[sentence]
+        manifest = {'size': os.path.getsize(self.path), 'superseded': self._superseded, 'sentences': sentences}
+        with open(self.manifest_path, 'w') as f:
+            json.dump(manifest, f)